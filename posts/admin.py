@@ -1,6 +1,12 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
+from django.utils import timezone
 
+from .export import export_stream, parse_since
 from .models import Post, Group
+from .search import filter_matching, is_indexed, match_expression
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +15,50 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not is_indexed():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        match = match_expression(search_term)
+        if match is None:
+            return queryset, False
+        return filter_matching(queryset, match), False
+
+    def get_urls(self):
+        urls = [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='posts_post_export',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def export_view(self, request):
+        """Stream NDJSON export of posts and comments to superusers.
+
+        Takes `since` and `gzip` GET params like the export_posts command.
+        """
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        try:
+            since = parse_since(request.GET.get('since'))
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+        until = timezone.now()
+        gzip = bool(request.GET.get('gzip'))
+        content_type = 'application/gzip' if gzip else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            export_stream(since, until, gzip), content_type=content_type
+        )
+        filename = f'posts-{until:%Y%m%dT%H%M%S}.ndjson'
+        if gzip:
+            filename += '.gz'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        response['X-Export-Until'] = until.isoformat()
+        return response
+
 
 admin.site.register(Post, PostAdmin)
 
@@ -0,0 +1,233 @@
+"""Read-only JSON views of the feeds.
+
+Posts are turned into plain dicts by FIELDS getters and dumped right
+away, no template or serializer framework is involved. Clients may ask
+only for the fields they need with `fields=id,text,author`.
+"""
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.urls import reverse
+
+from .decorators import cache_anonymous_page
+from .feeds import (author_feed, follow_feed, group_feed, index_feed,
+                    post_comments)
+from .fragments import version_key
+from .live import hub
+from .models import Follow, Group, Post, User
+from .paginators import decode_cursor
+from .polling import WAIT_TIMEOUT, TooManyWaiters, wait_for_posts
+from .views import author_versions, group_versions
+
+
+def image_url(post):
+    return post.image.url if post.image else None
+
+
+FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'comments_count': lambda post: post.comments_count,
+    'image': image_url,
+    'image_width': lambda post: post.image_width,
+    'image_height': lambda post: post.image_height,
+    'image_placeholder': lambda post: post.image_placeholder or None,
+    'url': lambda post: reverse('post', args=[post.author.username, post.pk]),
+}
+JSON_PARAMS = {'ensure_ascii': False}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(request):
+    """Return getters of fields named by `fields` GET param, all by default.
+
+    Raises FieldsError naming unknown fields.
+    """
+    names = [
+        name for name in request.GET.get('fields', '').split(',') if name
+    ]
+    if not names:
+        return FIELDS
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise FieldsError(f'Unknown fields: {", ".join(unknown)}.')
+    return {name: FIELDS[name] for name in names}
+
+
+def serialize_post(post, fields):
+    return {name: getter(post) for name, getter in fields.items()}
+
+
+def error_response(message, status):
+    return JsonResponse(
+        {'error': message}, status=status, json_dumps_params=JSON_PARAMS
+    )
+
+
+def page_link(request, **params):
+    """Return absolute url of the current view with other page params."""
+    query = request.GET.copy()
+    for name in ('before', 'after', 'page'):
+        query.pop(name, None)
+    query.update(params)
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def page_links(request, page):
+    """Return links to the next (older) and the previous (newer) pages."""
+    if getattr(page, 'is_cursor', False):
+        older = page.next_cursor and page_link(
+            request, before=page.next_cursor
+        )
+        newer = page.previous_cursor and page_link(
+            request, after=page.previous_cursor
+        )
+        return older, newer
+    older = page.has_next() and page_link(
+        request, page=page.next_page_number()
+    )
+    newer = page.has_previous() and page_link(
+        request, page=page.previous_page_number()
+    )
+    return older or None, newer or None
+
+
+def feed_response(request, paginator):
+    """Render the requested page of paginator as JSON."""
+    try:
+        fields = requested_fields(request)
+    except FieldsError as error:
+        return error_response(str(error), 400)
+    page = paginator.page_for_request(request)
+    results = [serialize_post(post, fields) for post in page]
+    older, newer = page_links(request, page)
+    return JsonResponse(
+        {'results': results, 'next': older, 'previous': newer},
+        json_dumps_params=JSON_PARAMS,
+    )
+
+
+@cache_anonymous_page(lambda: [version_key('index')])
+def index(request):
+    return feed_response(request, index_feed())
+
+
+@cache_anonymous_page(group_versions)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error_response('Group not found.', 404)
+    return feed_response(request, group_feed(group))
+
+
+@cache_anonymous_page(author_versions)
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error_response('User not found.', 404)
+    return feed_response(request, author_feed(author))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error_response('Authentication required.', 401)
+    return feed_response(request, follow_feed(request.user))
+
+
+@cache_anonymous_page(author_versions)
+def post_view(request, username, post_id):
+    """Return the post with its comments."""
+    try:
+        fields = requested_fields(request)
+    except FieldsError as error:
+        return error_response(str(error), 400)
+    post = Post.objects.for_feed().filter(
+        author__username=username, id=post_id
+    ).first()
+    if post is None:
+        return error_response('Post not found.', 404)
+    data = serialize_post(post, fields)
+    data['comments'] = [
+        {
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }
+        for comment in post_comments(post)
+    ]
+    return JsonResponse(data, json_dumps_params=JSON_PARAMS)
+
+
+def new_posts_response(request, name, paginator, version_keys):
+    """Tell how many posts of the feed are newer than `after` cursor.
+
+    With `wait` the answer is held until the amount differs from `known`
+    or the long-poll timeout passes. When the process has no free long
+    poll slot it answers 503 with Retry-After.
+    """
+    position = decode_cursor(request.GET.get('after'))
+    if position is None:
+        return error_response('Cursor `after` is required.', 400)
+    known = None
+    if request.GET.get('wait'):
+        try:
+            known = int(request.GET.get('known', 0))
+        except ValueError:
+            return error_response('Amount `known` must be a number.', 400)
+    try:
+        answer = wait_for_posts(
+            name, paginator, version_keys, position, known
+        )
+    except TooManyWaiters:
+        response = error_response('Too many waiting requests.', 503)
+        response['Retry-After'] = WAIT_TIMEOUT
+        return response
+    response = JsonResponse(answer)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def index_new_posts(request):
+    return new_posts_response(
+        request, 'index', index_feed(), [version_key('index')]
+    )
+
+
+def group_new_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error_response('Group not found.', 404)
+    return new_posts_response(
+        request, f'group:{group.pk}', group_feed(group),
+        [version_key('group', group.pk)],
+    )
+
+
+def follow_new_posts(request):
+    user = request.user
+    if not user.is_authenticated:
+        return error_response('Authentication required.', 401)
+    authors = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    version_keys = [version_key('follow', user.pk)]
+    version_keys.extend(version_key('author', pk) for pk in authors)
+    return new_posts_response(
+        request, f'follow:{user.pk}', follow_feed(user), version_keys
+    )
+
+
+def stats(request):
+    """Return counters of this process to staff for monitoring."""
+    if not request.user.is_staff:
+        return error_response('Staff only.', 403)
+    data = {'live_comments': hub.get_stats()}
+    if hasattr(cache, 'get_stats'):
+        data['cache'] = cache.get_stats()
+    return JsonResponse(data)
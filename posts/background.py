@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+# amount of threads of every pool
+POOL_WORKERS = {
+    'timeline': settings.TIMELINE_FANOUT_WORKERS,
+    'thumbnails': settings.THUMBNAIL_WORKERS,
+    'uploads': settings.UPLOAD_WORKERS,
+}
+
+_executors = {}
+_executors_lock = Lock()
+
+
+def get_executor(pool):
+    with _executors_lock:
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(
+                max_workers=POOL_WORKERS[pool], thread_name_prefix=pool,
+            )
+        return _executors[pool]
+
+
+def run_in_background(pool, func, *args):
+    """Run func in the pool once the transaction is committed.
+
+    With BACKGROUND_EAGER it runs in the calling thread instead, which
+    tests on in-memory SQLite need.
+    """
+    if settings.BACKGROUND_EAGER:
+        transaction.on_commit(lambda: func(*args))
+        return
+
+    def job():
+        try:
+            func(*args)
+        finally:
+            connections.close_all()
+    transaction.on_commit(lambda: get_executor(pool).submit(job))
@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, StoredImage, User, UserStats
+
+
+AUTHOR_STATS_TIMEOUT = settings.AUTHOR_STATS_TIMEOUT
+SIDEBAR_COUNTERS = ('posts_count', 'followers_count', 'followings_count')
+
+
+def author_stats_key(user_id):
+    return f'author_stats:{user_id}'
+
+
+def shifted(name, delta):
+    """Return counter name shifted by delta but never below zero.
+
+    Counters drift from real amounts, e.g. after rows saved in bulk, and
+    a negative value would break the positive field.
+    """
+    return Greatest(F(name) + delta, 0)
+
+
+def change_comments_count(post_id, delta):
+    """Atomically shift the amount of comments of the post."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=shifted('comments_count', delta)
+    )
+
+
+def change_user_stats(user_id, **deltas):
+    """Atomically shift user's counters, e.g. posts_count=1.
+
+    Missing stats are left as they are and rebuilt on the next read.
+    """
+    UserStats.objects.filter(user_id=user_id).update(**{
+        name: shifted(name, delta) for name, delta in deltas.items()
+    })
+    cache.delete(author_stats_key(user_id))
+
+
+def claim_image(name):
+    """Count one more post using the image file.
+
+    One upsert, a release deleting the row at the same time can not lose
+    the new reference, as a create followed by an update would.
+    """
+    table = connection.ops.quote_name(StoredImage._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (name, refs) VALUES (%s, 1) '
+            f'ON CONFLICT (name) DO UPDATE SET refs = {table}.refs + 1',
+            [name],
+        )
+
+
+def release_image(name):
+    """Count one post less using the image file.
+
+    Returns True when it was the last one and the file may be deleted.
+    """
+    StoredImage.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1
+    )
+    deleted, _ = StoredImage.objects.filter(name=name, refs=0).delete()
+    return bool(deleted)
+
+
+def get_author_stats(author):
+    """Return sidebar counters of the author, cached per author."""
+    key = author_stats_key(author.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = UserStats.objects.filter(
+            user_id=author.pk
+        ).values(*SIDEBAR_COUNTERS).first()
+        if stats is None:
+            rebuilt = rebuild_user_stats(author.pk)
+            stats = {name: getattr(rebuilt, name) for name in SIDEBAR_COUNTERS}
+        cache.set(key, stats, AUTHOR_STATS_TIMEOUT)
+    return stats
+
+
+def get_author_sidebar(author, viewer):
+    """Return everything the author card shows to the viewer.
+
+    Counters are shared by all viewers, the follow flag is looked up for
+    each of them.
+    """
+    is_following = (
+        viewer.is_authenticated and viewer != author
+        and Follow.objects.filter(author=author, user=viewer).exists()
+    )
+    return {**get_author_stats(author), 'is_following': is_following}
+
+
+def rebuild_user_stats(user_id):
+    """Count everything for one user from scratch."""
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'followings_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        },
+    )
+    cache.delete(author_stats_key(user_id))
+    return stats
+
+
+def count_of(queryset, field):
+    """Return subquery counting rows of queryset related by field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(amount=Count('pk')).values('amount'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def rebuild_image_refs():
+    """Recount posts using every image file."""
+    StoredImage.objects.all().delete()
+    images = Post.objects.exclude(image='').exclude(
+        image__isnull=True
+    ).values('image').annotate(refs=Count('pk')).order_by()
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=row['image'], refs=row['refs'])
+         for row in images.iterator()),
+        batch_size=1000,
+    )
+
+
+def rebuild_counters():
+    """Recount every stored counter with a few set-based queries."""
+    Post.objects.update(comments_count=count_of(Comment.objects, 'post'))
+    rebuild_image_refs()
+    existing = UserStats.objects.values('user_id')
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.exclude(
+            pk__in=existing
+        ).values_list('pk', flat=True).iterator()),
+        batch_size=1000,
+    )
+    UserStats.objects.update(
+        posts_count=count_of(Post.objects, 'author'),
+        followers_count=count_of(Follow.objects, 'author'),
+        followings_count=count_of(Follow.objects, 'user'),
+    )
+    batch = []
+    for pk in User.objects.values_list('pk', flat=True).iterator():
+        batch.append(author_stats_key(pk))
+        if len(batch) == 1000:
+            cache.delete_many(batch)
+            batch = []
+    cache.delete_many(batch)
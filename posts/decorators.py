@@ -0,0 +1,77 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .fragments import GROUPS_VERSION, get_versions, version_key
+
+
+PAGE_TIMEOUT = settings.ANONYMOUS_PAGE_TIMEOUT
+PK_TIMEOUT = settings.CACHED_PK_TIMEOUT
+
+
+def pk_key(model, field, value):
+    return f'pk:{model._meta.label_lower}:{field}:{value}'
+
+
+def cached_pk(model, field, value):
+    """Return pk of the object with field equal to value or None.
+
+    Lets cached pages find their versions without touching the database.
+    Signals forget the pk when the object is renamed or deleted.
+    """
+    key = pk_key(model, field, value)
+    pk = cache.get(key)
+    if pk is None:
+        pk = model.objects.filter(
+            **{field: value}
+        ).values_list('pk', flat=True).first()
+        if pk is not None:
+            cache.set(key, pk, PK_TIMEOUT)
+    return pk
+
+
+def cache_anonymous_page(version_keys):
+    """Cache whole responses for anonymous GET requests.
+
+    version_keys gets view kwargs and returns version keys of the page or
+    None when there is nothing to cache. ETag and Last-Modified come from
+    the versions, so repeat visitors get 304 without rendering.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.user.is_authenticated
+                    or request.method not in ('GET', 'HEAD')):
+                return view(request, *args, **kwargs)
+            keys = version_keys(**kwargs)
+            if keys is None:
+                return view(request, *args, **kwargs)
+            versions = get_versions([version_key(GROUPS_VERSION), *keys])
+            digest = hashlib.md5(
+                f'{request.get_full_path()}:{versions}'.encode()
+            ).hexdigest()
+            etag = quote_etag(digest)
+            last_modified = max(versions) // 10 ** 6
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+            page_key = f'anonymous_page:{digest}'
+            response = cache.get(page_key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.cookies:
+                    return response
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                response['Cache-Control'] = 'no-cache'
+                patch_vary_headers(response, ('Cookie',))
+                cache.set(page_key, response, PAGE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,118 @@
+"""NDJSON export of posts and comments for analytics.
+
+Rows are read by iterator() as plain values, every one becomes a line
+at once and the output may be gzipped on the fly, so memory stays flat
+whatever the amount of rows.
+"""
+import zlib
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Post
+
+
+CHUNK_SIZE = settings.EXPORT_CHUNK_SIZE
+BUFFER_SIZE = settings.EXPORT_BUFFER_SIZE
+
+# exported field by queried value of every kind of rows
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def parse_since(value):
+    """Turn an ISO date or datetime into an aware datetime.
+
+    Returns None for an empty value, raises ValueError for a broken one.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Not a date: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def rows(model, fields, date_field, since, until, chunk_size):
+    queryset = model.objects.filter(**{f'{date_field}__lte': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{date_field}__gt': since})
+    names = list(fields)
+    values = queryset.order_by('pk').values_list(*fields.values())
+    for row in values.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, row))
+
+
+def export_lines(since=None, until=None, chunk_size=CHUNK_SIZE, counts=None):
+    """Yield NDJSON lines of posts and then comments as bytes.
+
+    Rows dated after since and up to until are exported, until defaults
+    to now and is the since of the next incremental export. counts, if
+    given, is a Counter of exported rows by type.
+    """
+    until = until or timezone.now()
+    encode = DjangoJSONEncoder(ensure_ascii=False).encode
+    kinds = [
+        ('post', Post, POST_FIELDS, 'pub_date'),
+        ('comment', Comment, COMMENT_FIELDS, 'created'),
+    ]
+    for kind, model, fields, date_field in kinds:
+        for row in rows(model, fields, date_field, since, until, chunk_size):
+            if counts is not None:
+                counts[kind] += 1
+            yield (encode({'type': kind, **row}) + '\n').encode()
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    """Join small chunks into blocks of at least size bytes."""
+    block = []
+    length = 0
+    for chunk in chunks:
+        block.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(block)
+            block = []
+            length = 0
+    if block:
+        yield b''.join(block)
+
+
+def gzipped(chunks, level=6):
+    """Compress chunks into a gzip stream piece by piece."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(since=None, until=None, gzip=False, counts=None):
+    """Return blocks of the export ready to be written or streamed."""
+    chunks = export_lines(since, until, counts=counts)
+    if gzip:
+        chunks = gzipped(chunks)
+    return buffered(chunks)
@@ -0,0 +1,42 @@
+"""Paginated feeds shared by the HTML pages and the JSON API."""
+from django.conf import settings
+
+from .models import Comment, Post, TimelineEntry
+from .paginators import FeedPaginator, TimelinePaginator, feed_key
+
+
+PER_PAGE = settings.PER_PAGE
+
+
+def index_feed():
+    return FeedPaginator(Post.objects.for_feed(), PER_PAGE)
+
+
+def group_feed(group):
+    return FeedPaginator(
+        Post.objects.for_feed().filter(group=group),
+        PER_PAGE,
+        feed=feed_key('group', group.pk),
+    )
+
+
+def author_feed(author):
+    return FeedPaginator(
+        Post.objects.for_feed().filter(author=author),
+        PER_PAGE,
+        feed=feed_key('author', author.pk),
+    )
+
+
+def follow_feed(user):
+    """Return paginator over posts of authors the user follows."""
+    timeline = TimelineEntry.objects.select_related(
+        'post__author', 'post__group'
+    ).filter(user=user)
+    return TimelinePaginator(
+        timeline, PER_PAGE, feed=feed_key('follow', user.pk)
+    )
+
+
+def post_comments(post):
+    return Comment.objects.select_related('author', 'post').filter(post=post)
@@ -0,0 +1,124 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+FRAGMENT_TIMEOUT = settings.FEED_FRAGMENT_TIMEOUT
+FRAGMENT_GRACE = settings.FEED_FRAGMENT_GRACE
+REBUILD_LOCK_TIMEOUT = settings.FRAGMENT_REBUILD_LOCK_TIMEOUT
+REBUILD_WAIT = settings.FRAGMENT_REBUILD_WAIT
+GROUPS_VERSION = 'groups'
+PAGE_PARAMS = ('page', 'before', 'after')
+
+
+def version_key(name, pk=None):
+    """Return cache key of the version of a feed fragment.
+
+    Names are `index`, `group`, `author`, `follow` and `groups`, the
+    last one changes with any group shown in post cards.
+    """
+    if pk is None:
+        return f'feed_version:{name}'
+    return f'feed_version:{name}:{pk}'
+
+
+def new_version():
+    """Return the current time in microseconds.
+
+    Versions never repeat after eviction and tell when a feed changed.
+    """
+    return time.time_ns() // 1000
+
+
+def get_versions(keys):
+    """Return versions of keys, starting missing ones."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    """Make every cached fragment built with keys outdated."""
+    version = new_version()
+    cache.set_many({key: version for key in keys}, None)
+
+
+def feed_fragment(request, feed, keys):
+    """Return context for `{% stale_cache %}` of a feed page.
+
+    Key varies on the feed, like `index`, `group:<pk>`, `author:<pk>` or
+    `follow:<user pk>`, page or cursor and viewer, since post cards show
+    the edit link to their author only. Versions are kept apart, so the
+    last rendered page can be served while a new one is being built.
+    """
+    keys = [version_key(GROUPS_VERSION), *keys]
+    position = [
+        f'{param}={request.GET[param]}'
+        for param in PAGE_PARAMS if param in request.GET
+    ]
+    return {
+        'fragment_key': ':'.join([feed, *position, str(request.user.pk)]),
+        'fragment_version': ':'.join(map(str, get_versions(keys))),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'fragment_grace': FRAGMENT_GRACE,
+    }
+
+
+def get_or_rebuild(key, build, timeout, grace=FRAGMENT_GRACE, version=None):
+    """Return cached value of key, building it by one request at a time.
+
+    A value is fresh for timeout seconds while its version matches. When
+    it is outdated, the request holding the rebuild lock builds a new one
+    and the others get the outdated value: within grace seconds after
+    expiry, or for any old version while the lock is held. Without a
+    value they may serve the others wait up to REBUILD_WAIT seconds for
+    the builder.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        entry_version, fresh_until, value = entry
+        if entry_version == version and now < fresh_until:
+            return value
+        if entry_version != version or now < fresh_until + grace:
+            if not acquire_rebuild_lock(key):
+                return value
+            return rebuild(key, build, timeout, grace, version)
+    if acquire_rebuild_lock(key):
+        return rebuild(key, build, timeout, grace, version)
+    deadline = now + REBUILD_WAIT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            entry_version, fresh_until, value = entry
+            if entry_version == version and time.time() < fresh_until + grace:
+                return value
+    return build()
+
+
+def acquire_rebuild_lock(key):
+    return cache.add(f'rebuild_lock:{key}', 1, REBUILD_LOCK_TIMEOUT)
+
+
+def rebuild(key, build, timeout, grace, version):
+    try:
+        value = build()
+        entry = (version, time.time() + timeout, value)
+        cache.set(key, entry, timeout + grace)
+    finally:
+        cache.delete(f'rebuild_lock:{key}')
+    return value
+
+
+def post_version_keys(post, group_ids=()):
+    """Return version keys of fragments showing the post."""
+    keys = [version_key('index'), version_key('author', post.author_id)]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            keys.append(version_key('group', group_id))
+    return keys
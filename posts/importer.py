@@ -0,0 +1,285 @@
+"""Bulk import of groups, posts, comments and follows.
+
+Rows look like lines of export_posts: a `type` of `group`, `post`,
+`comment` or `follow` and the fields of that type. Every batch is
+saved by a few bulk_create calls in one transaction, authors and groups
+are resolved through dicts loaded once. Posts and follows of a batch
+reach timelines by one INSERT ... SELECT, image variants of posts are
+left to build_image_variants.
+"""
+import csv
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fragments import GROUPS_VERSION, bump_versions, version_key
+from .models import Comment, Follow, Group, Post, User
+from .paginators import feed_key
+from .timeline import deliver_follows, deliver_posts
+
+
+KINDS = ('group', 'post', 'comment', 'follow')
+
+
+class RowError(ValueError):
+    """Row which can not be imported, the message tells why."""
+
+
+def read_rows(path, kind=None):
+    """Yield (line number, row) of a JSONL or CSV file.
+
+    CSV is told by the extension, its header names the fields. kind is
+    used for rows without `type`.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.csv'):
+            rows = enumerate(csv.DictReader(file), start=2)
+        else:
+            rows = (
+                (number, json.loads(line))
+                for number, line in enumerate(file, start=1)
+                if line.strip()
+            )
+        for number, row in rows:
+            if kind is not None:
+                row.setdefault('type', kind)
+            yield number, row
+
+
+def read_checkpoint(path):
+    """Return the last imported line number stored at path or 0."""
+    try:
+        with open(path) as file:
+            return json.load(file)['line']
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, line):
+    """Store the line number so that a rerun starts after it."""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'line': line}, file)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def imported_dates():
+    """Let bulk_create keep given dates of auto_now_add fields."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def parse_id(value):
+    return int(value) if value not in (None, '') else None
+
+
+def parse_moment(value):
+    if not value:
+        return timezone.now()
+    moment = parse_datetime(value)
+    if moment is None:
+        raise RowError(f'Broken date {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Importer:
+    """Save batches of rows, counting imported and skipped ones.
+
+    With create_users unknown authors get accounts without a password,
+    otherwise their rows are skipped.
+    """
+
+    def __init__(self, create_users=False):
+        self.create_users = create_users
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.imported = Counter()
+        self.skipped = Counter()
+        self.followers = set()
+        self.images = 0
+
+    def user_id(self, username):
+        pk = self.users.get(username)
+        if pk is None:
+            raise RowError(f'Unknown user {username}')
+        return pk
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        pk = self.groups.get(slug)
+        if pk is None:
+            raise RowError(f'Unknown group {slug}')
+        return pk
+
+    def import_batch(self, rows):
+        """Save rows in one transaction, groups and authors go first.
+
+        Returns messages of skipped rows.
+        """
+        by_kind = {kind: [] for kind in KINDS}
+        problems = []
+        for number, row in rows:
+            kind = row.get('type')
+            if kind in by_kind:
+                by_kind[kind].append((number, row))
+            else:
+                self.skipped['unknown'] += 1
+                problems.append(f'Line {number}: unknown type {kind}')
+        with transaction.atomic(), imported_dates():
+            if self.create_users:
+                self.add_users(by_kind)
+            for kind in KINDS:
+                objects = []
+                for number, row in by_kind[kind]:
+                    try:
+                        objects.append(getattr(self, f'build_{kind}')(row))
+                    except (RowError, KeyError, ValueError) as error:
+                        self.skipped[kind] += 1
+                        problems.append(f'Line {number}: {error!r}')
+                getattr(self, f'save_{kind}s')(objects)
+        return problems
+
+    def add_users(self, by_kind):
+        names = set()
+        for kind, fields in (('post', ['author']), ('comment', ['author']),
+                             ('follow', ['user', 'author'])):
+            for _, row in by_kind[kind]:
+                names.update(row.get(field) for field in fields)
+        missing = [name for name in names if name and name not in self.users]
+        if not missing:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            User(username=name, password=password) for name in missing
+        )
+        self.users.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+        self.imported['user'] += len(missing)
+
+    def build_group(self, row):
+        return Group(
+            title=row['title'],
+            slug=row['slug'],
+            description=row.get('description') or '',
+        )
+
+    def save_groups(self, groups):
+        groups = [group for group in groups if group.slug not in self.groups]
+        Group.objects.bulk_create(groups, ignore_conflicts=True)
+        slugs = [group.slug for group in groups]
+        self.groups.update(Group.objects.filter(
+            slug__in=slugs
+        ).values_list('slug', 'pk'))
+        self.imported['group'] += len(groups)
+
+    def build_post(self, row):
+        return Post(
+            id=parse_id(row.get('id')),
+            text=row['text'],
+            pub_date=parse_moment(row.get('pub_date')),
+            author_id=self.user_id(row['author']),
+            group_id=self.group_id(row.get('group')),
+            image=row.get('image') or None,
+        )
+
+    def save_posts(self, posts):
+        saved = self.new_rows(Post, posts)
+        self.skipped['post'] += len(posts) - len(saved)
+        if not saved:
+            return
+        last_pk = Post.objects.aggregate(Max('pk'))['pk__max'] or 0
+        Post.objects.bulk_create(saved, fan_out=False)
+        self.imported['post'] += len(saved)
+        self.images += sum(1 for post in saved if post.image)
+        ids = [post.pk for post in saved if post.pk is not None]
+        new = Q(pk__in=ids)
+        if len(ids) < len(saved):
+            # some databases return no ids, new rows are numbered after
+            # the last one
+            new |= Q(pk__gt=last_pk)
+        deliver_posts(Post.objects.filter(new))
+        self.followers.update(Follow.objects.filter(
+            author_id__in={post.author_id for post in saved}
+        ).values_list('user_id', flat=True))
+
+    @staticmethod
+    def new_rows(model, objects):
+        """Drop objects whose ids are taken, e.g. after a rerun."""
+        taken = set(model.objects.filter(
+            pk__in=[obj.pk for obj in objects if obj.pk is not None]
+        ).values_list('pk', flat=True))
+        new = []
+        for obj in objects:
+            if obj.pk is None or obj.pk not in taken:
+                new.append(obj)
+                taken.add(obj.pk)
+        return new
+
+    def build_comment(self, row):
+        return Comment(
+            id=parse_id(row.get('id')),
+            post_id=int(row['post']),
+            author_id=self.user_id(row['author']),
+            text=row['text'],
+            created=parse_moment(row.get('created')),
+        )
+
+    def save_comments(self, comments):
+        posts = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}
+        ).values_list('pk', flat=True))
+        saved = [
+            comment for comment in self.new_rows(Comment, comments)
+            if comment.post_id in posts
+        ]
+        self.skipped['comment'] += len(comments) - len(saved)
+        Comment.objects.bulk_create(saved)
+        self.imported['comment'] += len(saved)
+
+    def build_follow(self, row):
+        user_id = self.user_id(row['user'])
+        author_id = self.user_id(row['author'])
+        if user_id == author_id:
+            raise RowError('Users can not follow themselves')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def save_follows(self, follows):
+        if not follows:
+            return
+        last_pk = Follow.objects.aggregate(Max('pk'))['pk__max'] or 0
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        # existing follows are skipped, new rows are numbered after the
+        # last one
+        new = Follow.objects.filter(pk__gt=last_pk)
+        deliver_follows(new)
+        followers = list(new.values_list('user_id', flat=True))
+        self.followers.update(followers)
+        self.imported['follow'] += len(followers)
+        self.skipped['follow'] += len(follows) - len(followers)
+
+    def outdate_caches(self):
+        """Drop cached pages and counts the import has changed."""
+        cache.delete_many([feed_key('follow', pk) for pk in self.followers])
+        bump_versions([version_key(GROUPS_VERSION)])
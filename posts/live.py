@@ -0,0 +1,191 @@
+"""Live comments of post pages sent as Server-Sent Events.
+
+Comments saved in this process wake their subscribers through the
+in-process Hub. Comments saved by other workers are noticed by the
+per-post watermark, the greatest comment id kept in the shared cache,
+which every subscriber compares every CHECK_INTERVAL seconds. Either
+way the new comments are read from the database by id. A stream holds a
+server thread, so MAX_CONNECTIONS is a share of SERVER_THREADS and pages
+open streams only when asked to.
+"""
+import json
+import time
+from queue import Empty, Full, Queue
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.template.loader import render_to_string
+
+from .models import Comment
+
+
+MAX_CONNECTIONS = settings.LIVE_COMMENTS_MAX_CONNECTIONS
+MAX_AGE = settings.LIVE_COMMENTS_MAX_AGE
+QUEUE_SIZE = settings.LIVE_COMMENTS_QUEUE_SIZE
+CHECK_INTERVAL = settings.LIVE_COMMENTS_CHECK_INTERVAL
+BATCH_SIZE = settings.LIVE_COMMENTS_BATCH_SIZE
+WATERMARK_TIMEOUT = 60 * 60 * 24
+# browsers reconnect after this many milliseconds
+RETRY = 3000
+
+
+class Hub:
+    """Bounded publish/subscribe of post ids within the process.
+
+    Every subscriber owns a queue of at most queue_size wake-ups. A full
+    queue drops the new one: the subscriber is going to read every
+    comment after its last one anyway.
+    """
+
+    def __init__(self, max_connections, queue_size):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.queues = {}
+        self.lock = Lock()
+        self.stats = {
+            'connections': 0,
+            'peak_connections': 0,
+            'rejected': 0,
+            'published': 0,
+            'dropped': 0,
+            'sent': 0,
+        }
+
+    def subscribe(self, post_id):
+        """Return a queue of wake-ups of the post or None if too busy."""
+        with self.lock:
+            if self.stats['connections'] >= self.max_connections:
+                self.stats['rejected'] += 1
+                return None
+            queue = Queue(self.queue_size)
+            self.queues.setdefault(post_id, set()).add(queue)
+            self.stats['connections'] += 1
+            self.stats['peak_connections'] = max(
+                self.stats['peak_connections'], self.stats['connections']
+            )
+            return queue
+
+    def unsubscribe(self, post_id, queue):
+        with self.lock:
+            queues = self.queues.get(post_id, set())
+            queues.discard(queue)
+            if not queues:
+                self.queues.pop(post_id, None)
+            self.stats['connections'] -= 1
+
+    def publish(self, post_id):
+        with self.lock:
+            queues = list(self.queues.get(post_id, ()))
+            self.stats['published'] += 1
+        for queue in queues:
+            try:
+                queue.put_nowait(post_id)
+            except Full:
+                self.count('dropped')
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def get_stats(self):
+        """Return counters of subscribers and events in this process."""
+        with self.lock:
+            return {**self.stats, 'posts': len(self.queues)}
+
+
+hub = Hub(MAX_CONNECTIONS, QUEUE_SIZE)
+
+
+def watermark_key(post_id):
+    return f'comments_watermark:{post_id}'
+
+
+def refresh_watermark(post_id):
+    """Store the greatest comment id of the post in the shared cache."""
+    watermark = Comment.objects.filter(
+        post_id=post_id
+    ).aggregate(Max('pk'))['pk__max'] or 0
+    cache.set(watermark_key(post_id), watermark, WATERMARK_TIMEOUT)
+    return watermark
+
+
+def get_watermark(post_id):
+    watermark = cache.get(watermark_key(post_id))
+    if watermark is None:
+        watermark = refresh_watermark(post_id)
+    return watermark
+
+
+def announce_comment(comment):
+    """Let subscribers of every worker know of the comment once saved."""
+    def announce():
+        refresh_watermark(comment.post_id)
+        hub.publish(comment.post_id)
+    transaction.on_commit(announce)
+
+
+def comment_event(comment):
+    html = render_to_string('posts/comment_item.html', {'item': comment})
+    data = json.dumps({'id': comment.pk, 'html': html}, ensure_ascii=False)
+    return f'id: {comment.pk}\nevent: comment\ndata: {data}\n\n'
+
+
+class CommentStream:
+    """SSE messages of comments of a post added after id `after`.
+
+    Waits for wake-ups of its queue, checking the watermark whenever
+    none comes within CHECK_INTERVAL and sending a keep-alive comment
+    meanwhile. Ends after MAX_AGE seconds. Django calls close() once the
+    response is over, even if it was never iterated.
+    """
+
+    def __init__(self, post_id, after, queue):
+        self.post_id = post_id
+        self.after = after
+        self.queue = queue
+        self.closed = False
+
+    def __iter__(self):
+        deadline = time.monotonic() + MAX_AGE
+        last = self.after
+        woken = False
+        yield f'retry: {RETRY}\n\n'
+        while True:
+            sent = 0
+            if woken or get_watermark(self.post_id) > last:
+                comments = Comment.objects.select_related('author').filter(
+                    post_id=self.post_id, pk__gt=last
+                ).order_by('pk')[:BATCH_SIZE]
+                for comment in comments:
+                    yield comment_event(comment)
+                    last = comment.pk
+                    sent += 1
+                hub.count('sent', sent)
+            else:
+                yield ': keep-alive\n\n'
+            if time.monotonic() >= deadline:
+                return
+            if sent == BATCH_SIZE:
+                # more comments are waiting
+                continue
+            try:
+                self.queue.get(timeout=CHECK_INTERVAL)
+                woken = True
+            except Empty:
+                woken = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            hub.unsubscribe(self.post_id, self.queue)
+
+
+def subscribe(post_id, after):
+    """Return CommentStream of the post or None if there are too many."""
+    queue = hub.subscribe(post_id)
+    if queue is None:
+        return None
+    return CommentStream(post_id, after, queue)
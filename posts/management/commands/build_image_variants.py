@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import Post
+from posts.thumbnails import save_variants
+
+
+class Command(BaseCommand):
+    help = ('Build responsive variants, sizes and placeholders of images '
+            'of posts which lack them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild variants of every post with an image.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(
+                Q(image_widths='') | Q(image_width__isnull=True)
+            )
+        built = failed = 0
+        posts = posts.only('image', 'image_widths', 'image_width')
+        for post in posts.iterator():
+            try:
+                save_variants(post, force=options['all'])
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Post {post.pk}: {error}')
+            else:
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Variants are built for {built} posts, {failed} failed.'
+        ))
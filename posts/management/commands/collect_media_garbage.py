@@ -0,0 +1,94 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.orphans import LiveMedia, find_orphans, forget_orphans, still_used
+
+
+class Command(BaseCommand):
+    help = 'Delete or quarantine images, variants and thumbnails which '\
+           'no post uses any more.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report orphaned files.',
+        )
+        parser.add_argument(
+            '--quarantine',
+            metavar='DIR',
+            help='Move orphans into DIR keeping their paths instead of '
+                 'deleting them.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Amount of files removed at once.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Skip files modified less than this many seconds ago.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.root = Post._meta.get_field('image').storage.location
+        self.found = self.size = self.removed = self.used = 0
+        live = LiveMedia()
+        batch = []
+        for name, size in find_orphans(self.root, live, options['min_age']):
+            self.found += 1
+            self.size += size
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                self.remove(batch)
+                batch = []
+        self.remove(batch)
+        if not options['dry_run']:
+            forget_orphans([], live.dead_thumbnails)
+        verb = 'would be removed' if options['dry_run'] else 'are removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {self.found} orphaned files taking {self.size} bytes, '
+            f'{self.removed} {verb}, {self.used} are used again.'
+        ))
+
+    def remove(self, names):
+        if not names:
+            return
+        if self.options['dry_run']:
+            for name in names:
+                self.stdout.write(name, self.style.NOTICE)
+            self.removed += len(names)
+            return
+        used = still_used(names)
+        self.used += len(used)
+        removed = []
+        for name in names:
+            if name in used:
+                continue
+            try:
+                self.remove_file(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+            else:
+                removed.append(name)
+        forget_orphans(removed)
+        self.removed += len(removed)
+        if self.options['verbosity'] > 1:
+            self.stdout.write(f'Removed {self.removed} files so far.')
+
+    def remove_file(self, name):
+        path = os.path.join(self.root, name)
+        quarantine = self.options['quarantine']
+        if quarantine is None:
+            os.remove(path)
+            return
+        target = os.path.join(quarantine, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
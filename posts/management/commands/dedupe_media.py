@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import rebuild_image_refs
+from posts.fragments import bump_versions, post_version_keys
+from posts.models import Post
+from posts.storage import content_hash, hashed_name
+from posts.thumbnails import delete_image_files
+
+
+class Command(BaseCommand):
+    help = 'Move images of posts under names of their content, so that '\
+           'identical files are stored once, and recount their references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be moved.',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('image', flat=True).distinct().order_by()
+        moved = shared = missing = freed = 0
+        outdated = set()
+        for name in list(names):
+            if not storage.exists(name):
+                missing += 1
+                continue
+            with storage.open(name) as file:
+                target = hashed_name(name, content_hash(file))
+            if target == name:
+                continue
+            moved += 1
+            if storage.exists(target):
+                shared += 1
+                freed += storage.size(name)
+            if options['dry_run']:
+                continue
+            with storage.open(name) as file:
+                storage.save(name, file)
+            with transaction.atomic():
+                posts = Post.objects.filter(image=name)
+                for post in posts.only('author_id', 'group_id'):
+                    outdated.update(post_version_keys(post))
+                posts.update(image=target, image_widths='')
+            delete_image_files(name)
+        if not options['dry_run']:
+            rebuild_image_refs()
+            bump_versions(outdated)
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} files, {shared} of them were duplicates '
+            f'taking {freed} bytes, {missing} files are missing.'
+        ))
+        if moved and not options['dry_run']:
+            self.stdout.write(
+                'Run build_image_variants to rebuild variants of moved images.'
+            )
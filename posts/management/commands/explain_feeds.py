@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Comment, Follow, Post
+
+
+FEED_INDEXES = (
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+    'follow_author_user_idx',
+)
+
+
+class Command(BaseCommand):
+    help = 'Show query plans and timings of feed queries, optionally as '\
+           'they were before the feed indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--without-indexes',
+            action='store_true',
+            help='Drop feed indexes inside a rolled back transaction.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def feed_queries(self):
+        post = Post.objects.exclude(group=None).first() or Post(pk=0)
+        follow = Follow.objects.first() or Follow(user_id=0, author_id=0)
+        feed = Post.objects.for_feed().order_by('-pub_date', '-pk')
+        return {
+            'group feed': feed.filter(group_id=post.group_id)[
+                :settings.PER_PAGE
+            ],
+            'profile feed': feed.filter(author_id=post.author_id)[
+                :settings.PER_PAGE
+            ],
+            'comments': Comment.objects.filter(post_id=post.pk),
+            'followers': Follow.objects.filter(
+                author_id=follow.author_id
+            ).values_list('user_id', flat=True),
+            'is following': Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ),
+        }
+
+    def report(self, repeat):
+        for name, queryset in self.feed_queries().items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            spent = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {spent:.3f} ms'
+            ))
+            self.stdout.write(queryset.explain())
+
+    def handle(self, *args, **options):
+        if not options['without_indexes']:
+            self.report(options['repeat'])
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for name in FEED_INDEXES:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(name)}'
+                    )
+            self.report(options['repeat'])
+            transaction.set_rollback(True)
@@ -0,0 +1,51 @@
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.export import export_stream, parse_since
+
+
+class Command(BaseCommand):
+    help = 'Export posts and comments as NDJSON, one object per line.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Export only rows dated after this ISO date or datetime, '
+                 'e.g. the watermark printed by the previous export.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip.',
+        )
+        parser.add_argument(
+            '--output',
+            metavar='FILE',
+            help='Write into FILE instead of stdout.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+        except ValueError as error:
+            raise CommandError(error)
+        until = timezone.now()
+        counts = Counter()
+        blocks = export_stream(since, until, options['gzip'], counts)
+        if options['output'] is None:
+            self.write(sys.stdout.buffer, blocks)
+        else:
+            with open(options['output'], 'wb') as output:
+                self.write(output, blocks)
+        self.stderr.write(
+            f'Exported {counts["post"]} posts and {counts["comment"]} '
+            f'comments. Next --since: {until.isoformat()}'
+        )
+
+    def write(self, output, blocks):
+        for block in blocks:
+            output.write(block)
+        output.flush()
@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts.counters import rebuild_counters
+from posts.importer import (KINDS, Importer, read_checkpoint, read_rows,
+                            write_checkpoint)
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Import groups, posts, comments and follows from JSONL or CSV '\
+           'files in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file or CSV file with header.')
+        parser.add_argument(
+            '--type',
+            choices=KINDS,
+            help='Type of rows which have no `type` field.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Amount of rows saved in one transaction.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            metavar='FILE',
+            help='Remember the last imported line in FILE and start after '
+                 'it when run again. Defaults to PATH.checkpoint.',
+        )
+        parser.add_argument(
+            '--create-users',
+            action='store_true',
+            help='Create unknown authors without password instead of '
+                 'skipping their rows.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        start = read_checkpoint(checkpoint)
+        if start:
+            self.stdout.write(f'Resuming after line {start}.')
+        importer = Importer(create_users=options['create_users'])
+        self.started = time.monotonic()
+        self.rows = 0
+        batch = []
+        try:
+            for number, row in read_rows(path, options['type']):
+                if number <= start:
+                    continue
+                batch.append((number, row))
+                if len(batch) >= options['batch_size']:
+                    self.save(importer, batch, checkpoint)
+                    batch = []
+            self.save(importer, batch, checkpoint)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        with transaction.atomic():
+            reset_sequences()
+            rebuild_counters()
+        importer.outdate_caches()
+        imported = ', '.join(
+            f'{amount} {kind}s' for kind, amount in importer.imported.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported or "nothing"} from {self.rows} rows at '
+            f'{self.rate():.0f} rows/s, '
+            f'{sum(importer.skipped.values())} rows skipped.'
+        ))
+        if importer.images:
+            self.stdout.write(
+                f'Run build_image_variants to prepare {importer.images} '
+                f'imported images.'
+            )
+
+    def save(self, importer, batch, checkpoint):
+        if not batch:
+            return
+        for problem in importer.import_batch(batch):
+            self.stderr.write(problem)
+        write_checkpoint(checkpoint, batch[-1][0])
+        self.rows += len(batch)
+        self.stdout.write(
+            f'Line {batch[-1][0]}: {self.rows} rows, {self.rate():.0f} rows/s'
+        )
+
+    def rate(self):
+        return self.rows / max(time.monotonic() - self.started, 1e-6)
+
+
+def reset_sequences():
+    """Move id sequences past ids given by imported rows."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Post, Comment])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.search import is_indexed, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Fill the full-text search index with texts of all posts.'
+
+    def handle(self, *args, **options):
+        if not is_indexed():
+            raise CommandError('Full-text index is kept only on SQLite.')
+        with transaction.atomic():
+            rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index is rebuilt.'))
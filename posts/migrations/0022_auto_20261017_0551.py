@@ -0,0 +1,62 @@
+# Generated by Django 2.2.6 on 2026-10-17 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    commented = Post.objects.order_by().annotate(
+        amount=Count('comments')
+    ).filter(amount__gt=0).values_list('pk', 'amount')
+    for pk, amount in commented.iterator():
+        Post.objects.filter(pk=pk).update(comments_count=amount)
+    posts = dict(Post.objects.order_by().values('author').annotate(
+        amount=Count('pk')
+    ).values_list('author', 'amount'))
+    followers = dict(Follow.objects.values('author').annotate(
+        amount=Count('pk')
+    ).values_list('author', 'amount'))
+    followings = dict(Follow.objects.values('user').annotate(
+        amount=Count('pk')
+    ).values_list('user', 'amount'))
+    UserStats.objects.bulk_create(
+        (UserStats(
+            user_id=pk,
+            posts_count=posts.get(pk, 0),
+            followers_count=followers.get(pk, 0),
+            followings_count=followings.get(pk, 0),
+        ) for pk in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0021_auto_20261017_0548'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='записей')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='подписчиков')),
+                ('followings_count', models.PositiveIntegerField(default=0, verbose_name='подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-17 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_auto_20261017_0555'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_widths',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='ширины вариантов картинки'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.6 on 2026-10-17 06:16
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_stored_images(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    images = Post.objects.exclude(image='').exclude(
+        image__isnull=True
+    ).values('image').annotate(refs=Count('pk')).order_by()
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=row['image'], refs=row['refs'])
+         for row in images.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_post_image_widths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='имя файла')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='ссылок')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.RunPython(fill_stored_images, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.dispatch import Signal
+
+from .storage import ContentAddressedStorage
 
 
 User = get_user_model()
+# bulk_create sends no post_save, counters listen to this one instead
+posts_bulk_created = Signal(providing_args=['posts', 'fan_out'])
 
 
 class Group(models.Model):
@@ -24,6 +29,24 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Return posts with everything post_item.html shows at hand."""
+        return self.select_related('author', 'group')
+
+    def bulk_create(self, objs, *args, fan_out=True, **kwargs):
+        """Save posts at once and send posts_bulk_created.
+
+        With fan_out=False timelines and thumbnails of the posts are left
+        to the caller, which may handle the whole batch in one go.
+        """
+        posts = super().bulk_create(objs, *args, **kwargs)
+        posts_bulk_created.send(
+            sender=self.model, posts=posts, fan_out=fan_out
+        )
+        return posts
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='текст',
@@ -44,14 +67,76 @@ class Post(models.Model):
         related_name="posts",
         help_text='Выберите группу. Это необязательно.',
     )
-    image = models.ImageField(upload_to="posts/", blank=True, null=True,)
+    image = models.ImageField(
+        upload_to="posts/",
+        storage=ContentAddressedStorage(),
+        blank=True,
+        null=True,
+    )
+    image_widths = models.CharField(
+        verbose_name='ширины вариантов картинки',
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+    )
+    image_width = models.PositiveIntegerField(
+        verbose_name='ширина картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='высота картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_placeholder = models.TextField(
+        verbose_name='размытое превью картинки',
+        blank=True,
+        default='',
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        """Never write back comments_count loaded with the post, it is
+        changed only by atomic updates.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     text = models.TextField(
@@ -71,6 +156,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ("created",)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:20]
@@ -89,3 +180,74 @@ class Follow(models.Model):
         null=False,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Keep counters shown in the author's sidebar."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('записей', default=0)
+    followers_count = models.PositiveIntegerField('подписчиков', default=0)
+    followings_count = models.PositiveIntegerField('подписок', default=0)
+
+    def __str__(self):
+        return f'stats of {self.user_id}'
+
+
+class StoredImage(models.Model):
+    """Count posts sharing one content-addressed image file."""
+    name = models.CharField('имя файла', max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField('ссылок', default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
+
+
+class TimelineEntry(models.Model):
+    """Post delivered to the follow feed of a user.
+
+    pub_date is copied from the post, so a feed page is one range of the
+    (user, pub_date, post) index.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} for {self.user_id}'
@@ -0,0 +1,157 @@
+"""Lookup of media files no post refers to any more.
+
+Live names are collected into sets with a few queries, then the upload
+and thumbnail directories are walked and every file is checked against
+them, so the cost does not grow with a query per file.
+"""
+import os
+import re
+import time
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post, StoredImage
+
+
+# `root.480w.webp` is a variant of the original named `root.<ext>`
+VARIANT = re.compile(r'^(?P<root>.+)\.\d+w\.\w+$')
+CHUNK_SIZE = 100
+
+
+def chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def kvstore_rows(identity, keys=None):
+    """Yield (key, value) of sorl kvstore rows, optionally only of keys."""
+    if keys is None:
+        rows = KVStoreModel.objects.filter(
+            key__startswith=add_prefix('', identity)
+        )
+        yield from rows.values_list('key', 'value').iterator()
+        return
+    for chunk in chunks(keys):
+        yield from KVStoreModel.objects.filter(
+            key__in=[add_prefix(key, identity) for key in chunk]
+        ).values_list('key', 'value').iterator()
+
+
+class LiveMedia:
+    """Names of every media file posts still use.
+
+    `dead_thumbnails` maps kvstore keys of images nobody uses to keys of
+    their thumbnails, these rows are dropped along with the files.
+    """
+
+    def __init__(self):
+        self.images = set(Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('image', flat=True).distinct().order_by().iterator())
+        self.roots = {os.path.splitext(name)[0] for name in self.images}
+        storage = Post._meta.get_field('image').storage
+        sources = {ImageFile(name, storage).key for name in self.images}
+        live_keys = set()
+        self.dead_thumbnails = {}
+        for key, value in kvstore_rows('thumbnails'):
+            source = del_prefix(key)
+            if source in sources:
+                live_keys.update(deserialize(value))
+            else:
+                self.dead_thumbnails[source] = deserialize(value)
+        self.thumbnails = {
+            deserialize(value)['name']
+            for _, value in kvstore_rows('image', live_keys)
+        }
+
+    def __contains__(self, name):
+        if name in self.images or name in self.thumbnails:
+            return True
+        match = VARIANT.match(name)
+        return match is not None and match.group('root') in self.roots
+
+
+def walk(root, directory, older_than):
+    """Yield (name, size) of files under directory modified before a time.
+
+    Names are relative to root with forward slashes like storage names.
+    """
+    for path, _, files in os.walk(os.path.join(root, directory)):
+        for filename in files:
+            full = os.path.join(path, filename)
+            try:
+                stat = os.stat(full)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < older_than:
+                name = os.path.relpath(full, root).replace(os.sep, '/')
+                yield name, stat.st_size
+
+
+def find_orphans(root, live, min_age):
+    """Yield (name, size) of media files which are not live.
+
+    Files younger than min_age seconds are skipped: an upload is stored
+    before its post row is committed.
+    """
+    directories = [
+        Post._meta.get_field('image').upload_to,
+        thumbnail_settings.THUMBNAIL_PREFIX,
+    ]
+    older_than = time.time() - min_age
+    for directory in directories:
+        for name, size in walk(root, directory, older_than):
+            if name not in live:
+                yield name, size
+
+
+def still_used(names):
+    """Return names which posts have started to use after the lookup.
+
+    A new upload identical to an orphan gets its name back, so every
+    batch is checked again right before its files are removed.
+    """
+    used = set()
+    roots = {}
+    for name in names:
+        match = VARIANT.match(name)
+        if match is not None:
+            roots.setdefault(match.group('root'), []).append(name)
+    for chunk in chunks(names):
+        used.update(Post.objects.filter(
+            image__in=chunk
+        ).values_list('image', flat=True))
+    for chunk in chunks(roots):
+        query = reduce(or_, (Q(image__startswith=f'{root}.')
+                             for root in chunk))
+        for image in Post.objects.filter(query).values_list(
+                'image', flat=True):
+            used.update(roots.get(os.path.splitext(image)[0], []))
+    return used
+
+
+def forget_orphans(names, dead_thumbnails=None):
+    """Drop database rows describing removed files.
+
+    Reference counts of removed originals go, and so do the kvstore
+    records of dead_thumbnails, which would point sorl to missing files.
+    """
+    for chunk in chunks(names):
+        StoredImage.objects.filter(name__in=chunk).delete()
+    keys = []
+    for source, thumbnails in (dead_thumbnails or {}).items():
+        keys.append(add_prefix(source, 'thumbnails'))
+        keys.append(add_prefix(source, 'image'))
+        keys.extend(add_prefix(key, 'image') for key in thumbnails)
+    for chunk in chunks(keys):
+        KVStoreModel.objects.filter(key__in=chunk).delete()
+        default.kvstore.cache.delete_many(chunk)
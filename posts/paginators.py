@@ -0,0 +1,242 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+INDEX_FEED = 'index'
+FEED_COUNT_TIMEOUT = settings.FEED_COUNT_TIMEOUT
+FEED_COUNT_ESTIMATE_FROM = settings.FEED_COUNT_ESTIMATE_FROM
+
+
+def pack_cursor(*values):
+    """Pack string forms of values into an url-safe string."""
+    raw = '|'.join(map(str, values))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(cursor, *parsers):
+    """Return values packed into cursor, each passed to its parser.
+
+    Returns None if the cursor is broken or a parser returns None.
+    """
+    if not cursor:
+        return None
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        parts = raw.split('|')
+        if len(parts) != len(parsers):
+            return None
+        values = tuple(parse(part) for parse, part in zip(parsers, parts))
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if None in values:
+        return None
+    return values
+
+
+def encode_cursor(post):
+    """Pack (pub_date, id) of a post into an url-safe string."""
+    return pack_cursor(post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(cursor):
+    """Return (pub_date, id) packed into cursor or None if it is broken."""
+    return unpack_cursor(cursor, parse_datetime, int)
+
+
+class CursorPage(Page):
+    """Page of posts located by cursor instead of page number.
+
+    Has no number, so templates should use `previous_cursor` and
+    `next_cursor` to build links. Posts are fetched on first access, a
+    page rendered from a cached fragment costs no query.
+    """
+    is_cursor = True
+
+    def __init__(self, paginator, load):
+        self.number = None
+        self.paginator = paginator
+        self._load = load
+
+    @cached_property
+    def _window(self):
+        return self._load()
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    @property
+    def previous_cursor(self):
+        return self._window[1]
+
+    @property
+    def next_cursor(self):
+        return self._window[2]
+
+    def __repr__(self):
+        return '<Page by cursor>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Paginate posts feed seeking on (pub_date, id).
+
+    Every page costs one indexed range query regardless of its depth.
+    Old `?page=N` links are still served by the offset based Paginator.
+    Subclasses may seek on other fields holding the same values and turn
+    fetched rows into posts with `to_posts`.
+    """
+    seek_fields = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        ordering = [f'-{field}' for field in self.seek_fields]
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+
+    def to_posts(self, rows):
+        return rows
+
+    def _get_page(self, object_list, *args, **kwargs):
+        return super()._get_page(
+            self.to_posts(list(object_list)), *args, **kwargs
+        )
+
+    def seek(self, lookup, position):
+        """Return filter of rows placed after position in lookup order.
+
+        The leading `pub_date <= X` (or `>=`) bounds the index range, the
+        OR alone would make the database scan the index from its start.
+        """
+        date_field, pk_field = self.seek_fields
+        pub_date, pk = position
+        return Q(**{f'{date_field}__{lookup}e': pub_date}) & (
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{f'{pk_field}__{lookup}': pk})
+        )
+
+    def page_for_request(self, request):
+        """Return the page asked by `before`, `after` or `page` GET params."""
+        if 'page' in request.GET:
+            return self.get_page(request.GET.get('page'))
+        before = decode_cursor(request.GET.get('before'))
+        if before is not None:
+            return self.page_before(before)
+        after = decode_cursor(request.GET.get('after'))
+        if after is not None:
+            return self.page_after(after)
+        return self.page_before(None)
+
+    def page_before(self, position):
+        """Return page of posts older than position or the newest ones."""
+        return CursorPage(self, lambda: self.window_before(position))
+
+    def page_after(self, position):
+        """Return page of posts newer than position."""
+        return CursorPage(self, lambda: self.window_after(position))
+
+    def window_before(self, position):
+        """Fetch posts older than position and cursors around them."""
+        rows = self.object_list
+        if position is not None:
+            rows = rows.filter(self.seek('lt', position))
+        posts = self.to_posts(list(rows[:self.per_page + 1]))
+        has_older = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        previous_cursor = next_cursor = None
+        if posts and position is not None:
+            previous_cursor = encode_cursor(posts[0])
+        if has_older:
+            next_cursor = encode_cursor(posts[-1])
+        return posts, previous_cursor, next_cursor
+
+    def window_after(self, position):
+        """Fetch posts newer than position, the closest ones first."""
+        rows = self.object_list.filter(self.seek('gt', position)).reverse()
+        posts = self.to_posts(list(rows[:self.per_page + 1]))
+        has_newer = len(posts) > self.per_page
+        posts = posts[:self.per_page][::-1]
+        if not posts:
+            return self.window_before(None)
+        previous_cursor = encode_cursor(posts[0]) if has_newer else None
+        return posts, previous_cursor, encode_cursor(posts[-1])
+
+
+def feed_key(name, pk=None):
+    """Return cache key of the posts amount in feed.
+
+    Feeds are `index`, `group`, `author` and `follow`; the last three
+    are identified by pk of a group, an author or a follower.
+    """
+    if pk is None:
+        return f'feed_count:{name}'
+    return f'feed_count:{name}:{pk}'
+
+
+def bump_feed_counts(keys, delta):
+    """Change cached amounts by delta leaving missing ones uncounted."""
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+
+def estimate_count(queryset):
+    """Return cheap approximate amount of rows in queryset's table."""
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table]
+            )
+            row = cursor.fetchone()
+        return max(int(row[0]), 0) if row else 0
+    return queryset.model.objects.aggregate(Max('pk'))['pk__max'] or 0
+
+
+class FeedPaginator(CursorPaginator):
+    """Cursor paginator which keeps amount of posts in the cache.
+
+    Amounts are changed by Post signals, so `page_range` of page-number
+    links costs no COUNT(*) while the cache is warm. The whole index
+    feed is estimated instead of counted when it is very large.
+    """
+
+    def __init__(self, object_list, per_page, feed=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed or feed_key(INDEX_FEED)
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.feed)
+        if count is not None:
+            return count
+        if self.feed == feed_key(INDEX_FEED):
+            count = estimate_count(self.object_list)
+            if count < FEED_COUNT_ESTIMATE_FROM:
+                count = None
+        if count is None:
+            count = super().count
+        cache.add(self.feed, count, FEED_COUNT_TIMEOUT)
+        return count
+
+
+class TimelinePaginator(FeedPaginator):
+    """Feed paginator reading TimelineEntry rows of one follower."""
+    seek_fields = ('pub_date', 'post_id')
+
+    def to_posts(self, rows):
+        return [row.post for row in rows]
@@ -0,0 +1,98 @@
+"""Answers to "are there new posts" without rendering feeds.
+
+Every feed keeps (pub_date, id) of its WINDOW newest posts in the cache
+under its fragment versions, so a poll costs a couple of cache reads
+until the feed changes and one LIMIT query after that. A long poll holds
+a server thread, so at most MAX_WAITERS of them wait in a process.
+"""
+import time
+from collections import namedtuple
+from threading import BoundedSemaphore
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .fragments import get_versions
+from .paginators import encode_cursor
+
+
+WINDOW = settings.NEW_POSTS_WINDOW
+WAIT_TIMEOUT = settings.NEW_POSTS_WAIT_TIMEOUT
+POLL_INTERVAL = settings.NEW_POSTS_POLL_INTERVAL
+MAX_WAITERS = settings.NEW_POSTS_MAX_WAITERS
+HEAD_TIMEOUT = settings.FEED_FRAGMENT_TIMEOUT
+
+
+# fields encode_cursor needs of a post
+Position = namedtuple('Position', ['pub_date', 'pk'])
+waiters = BoundedSemaphore(MAX_WAITERS)
+
+
+class TooManyWaiters(Exception):
+    """Every long poll slot of the process is taken."""
+
+
+def feed_head(name, paginator, versions):
+    """Return [(pub_date, id)] of the newest posts of the feed, newest first.
+
+    name tells feeds apart, the cached value lives as long as versions.
+    """
+    key = f'feed_head:{name}:{":".join(map(str, versions))}'
+    head = cache.get(key)
+    if head is None:
+        head = list(paginator.object_list.values_list(
+            *paginator.seek_fields
+        )[:WINDOW])
+        cache.set(key, head, HEAD_TIMEOUT)
+    return head
+
+
+def newer_posts(head, position):
+    """Describe posts of head placed after the (pub_date, id) position.
+
+    `more` tells that the window is full of new posts, so there may be
+    more of them than counted.
+    """
+    newer = [pk for pub_date, pk in head if (pub_date, pk) > position]
+    return {
+        'count': len(newer),
+        'ids': newer,
+        'more': len(newer) == WINDOW,
+        'cursor': encode_cursor(Position(*head[0])) if head else None,
+    }
+
+
+def wait_for_posts(name, paginator, version_keys, position, known=None):
+    """Return newer_posts of the feed, waiting while their count is known.
+
+    Without known answers at once. Otherwise polls versions of the feed
+    every POLL_INTERVAL seconds, which costs no query while nothing
+    changes, and gives up after WAIT_TIMEOUT. Raises TooManyWaiters when
+    MAX_WAITERS requests are waiting already.
+    """
+    if known is None:
+        versions = get_versions(version_keys)
+        return newer_posts(feed_head(name, paginator, versions), position)
+    if not waiters.acquire(blocking=False):
+        raise TooManyWaiters
+    try:
+        return poll_posts(name, paginator, version_keys, position, known)
+    finally:
+        waiters.release()
+
+
+def poll_posts(name, paginator, version_keys, position, known):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    versions = None
+    while True:
+        current = get_versions(version_keys)
+        if current != versions:
+            versions = current
+            answer = newer_posts(
+                feed_head(name, paginator, versions), position
+            )
+            if answer['count'] != known:
+                return answer
+        if time.monotonic() >= deadline:
+            return answer
+        time.sleep(POLL_INTERVAL)
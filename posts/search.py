@@ -0,0 +1,188 @@
+import re
+
+from django.db import connection, connections
+
+from .models import Post
+from .paginators import CursorPaginator, pack_cursor, unpack_cursor
+
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+# FTS5 table reads texts from posts_post by rowid, triggers keep it in step
+CREATE_INDEX = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(text, content='posts_post', content_rowid='id')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+]
+
+
+def is_indexed():
+    """Tell whether the database keeps the full-text index."""
+    return connection.vendor == 'sqlite'
+
+
+def create_search_index(using='default', **kwargs):
+    """Create the index and its triggers unless they exist.
+
+    Runs after every migrate: SQLite rebuilds a table on most schema
+    changes and drops its triggers with the old copy.
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for statement in CREATE_INDEX:
+            cursor.execute(statement)
+
+
+def rebuild_search_index():
+    """Refill the index from texts of all posts."""
+    create_search_index()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def match_expression(query):
+    """Turn user input into FTS5 query matching every word by prefix.
+
+    Words are quoted, so operators and quotes typed by users never make
+    the query invalid. Returns None when there is nothing to search.
+    """
+    words = WORD.findall(query or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_matching(queryset, match):
+    """Narrow queryset of posts to ones matching the FTS5 expression."""
+    table = Post._meta.db_table
+    return queryset.extra(
+        where=[f'{table}.id IN (SELECT rowid FROM {FTS_TABLE}'
+               f' WHERE {FTS_TABLE} MATCH %s)'],
+        params=[match],
+    )
+
+
+def ranked_ids(match, position, lookup, limit):
+    """Fetch (rank, pk) of matches placed after position in lookup order.
+
+    Lower bm25 rank is better, so `gt` walks to worse matches and `lt`
+    walks back to better ones.
+    """
+    operator = '>' if lookup == 'gt' else '<'
+    direction = 'ASC' if lookup == 'gt' else 'DESC'
+    sql = f'SELECT rank, rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    params = [match]
+    if position is not None:
+        sql += (f' AND (rank {operator} %s'
+                f' OR (rank = %s AND rowid {operator} %s))')
+        params.extend([position[0], position[0], position[1]])
+    sql += f' ORDER BY rank {direction}, rowid {direction} LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def encode_rank_cursor(rank, pk):
+    """Pack (rank, id) of a match into an url-safe string."""
+    return pack_cursor(repr(rank), pk)
+
+
+def decode_rank_cursor(cursor):
+    """Return (rank, id) packed into cursor or None if it is broken."""
+    return unpack_cursor(cursor, float, int)
+
+
+class SearchPaginator(CursorPaginator):
+    """Paginate matches of a full-text query from best to worst.
+
+    Seeks on (rank, id) of the index, every page costs one index query
+    and one query for the posts themselves.
+    """
+
+    def __init__(self, match, per_page):
+        super().__init__(Post.objects.none(), per_page)
+        self.match = match
+
+    def page_for_request(self, request):
+        """Return the page asked by `before` or `after` GET params."""
+        before = decode_rank_cursor(request.GET.get('before'))
+        if before is not None:
+            return self.page_before(before)
+        after = decode_rank_cursor(request.GET.get('after'))
+        if after is not None:
+            return self.page_after(after)
+        return self.page_before(None)
+
+    def fetch(self, position, lookup):
+        if self.match is None:
+            return [], False
+        rows = ranked_ids(self.match, position, lookup, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if lookup == 'lt':
+            rows.reverse()
+        posts = Post.objects.for_feed().in_bulk([pk for rank, pk in rows])
+        matches = [(rank, posts[pk]) for rank, pk in rows if pk in posts]
+        return matches, has_more
+
+    def window_before(self, position):
+        """Fetch matches worse than position and cursors around them."""
+        matches, has_worse = self.fetch(position, 'gt')
+        previous_cursor = next_cursor = None
+        if matches and position is not None:
+            rank, post = matches[0]
+            previous_cursor = encode_rank_cursor(rank, post.pk)
+        if has_worse:
+            rank, post = matches[-1]
+            next_cursor = encode_rank_cursor(rank, post.pk)
+        return [post for rank, post in matches], previous_cursor, next_cursor
+
+    def window_after(self, position):
+        """Fetch matches better than position, the best ones first."""
+        matches, has_better = self.fetch(position, 'lt')
+        if not matches:
+            return self.window_before(None)
+        rank, first = matches[0]
+        previous_cursor = None
+        if has_better:
+            previous_cursor = encode_rank_cursor(rank, first.pk)
+        rank, last = matches[-1]
+        next_cursor = encode_rank_cursor(rank, last.pk)
+        return [post for rank, post in matches], previous_cursor, next_cursor
+
+
+def search_posts(query, per_page):
+    """Return paginator over posts matching query.
+
+    Databases without the index fall back to a scan of post texts
+    ordered like the other feeds.
+    """
+    if is_indexed():
+        return SearchPaginator(match_expression(query), per_page)
+    posts = Post.objects.for_feed()
+    words = WORD.findall(query or '')
+    if not words:
+        posts = posts.none()
+    for word in words:
+        posts = posts.filter(text__icontains=word)
+    return CursorPaginator(posts, per_page)
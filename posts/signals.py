@@ -0,0 +1,288 @@
+import logging
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .counters import change_comments_count, change_user_stats, claim_image
+from .decorators import pk_key
+from .fragments import bump_versions, post_version_keys, version_key
+from .live import announce_comment
+from .models import (Comment, Follow, Group, Post, User, UserStats,
+                     posts_bulk_created)
+from .paginators import INDEX_FEED, bump_feed_counts, feed_key
+from .thumbnails import forget_image, schedule_thumbnails
+from .timeline import (drop_author, fan_in_author, fan_out_deletion,
+                       fan_out_post)
+from .uploads import describe_image
+
+
+logger = logging.getLogger(__name__)
+# fields cached_pk finds users and groups by
+LOOKUP_FIELDS = {User: 'username', Group: 'slug'}
+
+
+def post_feed_keys(post):
+    """Return cache keys of amounts of feeds showing the post.
+
+    Follow feeds are left out: their amounts are dropped by timeline
+    fan-out in batches, not changed follower by follower.
+    """
+    keys = [feed_key(INDEX_FEED), feed_key('author', post.author_id)]
+    if post.group_id is not None:
+        keys.append(feed_key('group', post.group_id))
+    return keys
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    previous = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', 'image').first()
+    if previous is None:
+        return
+    instance._previous_group_id, previous_image = previous
+    instance._previous_image = previous_image or ''
+    if instance._previous_image != (instance.image.name or ''):
+        # variants of the replaced image are outdated
+        instance.image_widths = ''
+
+
+@receiver(pre_save, sender=Post)
+def describe_post_image(sender, instance, **kwargs):
+    """Store size and placeholder of a new image along with the post.
+
+    Pages render them without opening the image file. An unreadable
+    image is left undescribed, the thumbnails job tries it once more.
+    """
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ''
+        return
+    previous = getattr(instance, '_previous_image', '')
+    if previous == instance.image.name and instance.image_width is not None:
+        return
+    try:
+        (instance.image_width, instance.image_height,
+         instance.image_placeholder) = describe_image(instance.image)
+    except (OSError, ValueError, SuspiciousFileOperation) as error:
+        logger.warning('Image %s is not described: %s',
+                       instance.image.name, error)
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ''
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        bump_feed_counts(post_feed_keys(instance), 1)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id == instance.group_id:
+        return
+    if previous_group_id is not None:
+        bump_feed_counts([feed_key('group', previous_group_id)], -1)
+    if instance.group_id is not None:
+        bump_feed_counts([feed_key('group', instance.group_id)], 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_feed_counts(post_feed_keys(instance), -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_feed_count(sender, instance, **kwargs):
+    cache.delete(feed_key('follow', instance.user_id))
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Group)
+def remember_lookup_value(sender, instance, **kwargs):
+    # deferred fields are left alone, reading them would cost a query
+    instance._lookup_value = instance.__dict__.get(LOOKUP_FIELDS[sender])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def forget_renamed_pk(sender, instance, created, **kwargs):
+    field = LOOKUP_FIELDS[sender]
+    previous = getattr(instance, '_lookup_value', None)
+    current = instance.__dict__.get(field)
+    if not created and previous is not None and previous != current:
+        cache.delete(pk_key(sender, field, previous))
+    instance._lookup_value = current
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def forget_deleted_pk(sender, instance, **kwargs):
+    field = LOOKUP_FIELDS[sender]
+    values = {getattr(instance, '_lookup_value', None),
+              instance.__dict__.get(field)} - {None}
+    cache.delete_many([pk_key(sender, field, value) for value in values])
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_author_new_post(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_author_deleted_post(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, **kwargs):
+    if created:
+        announce_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, followers_count=1)
+        change_user_stats(instance.user_id, followings_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, followers_count=-1)
+    change_user_stats(instance.user_id, followings_count=-1)
+
+
+@receiver(posts_bulk_created, sender=Post)
+def count_bulk_created_posts(sender, posts, fan_out=True, **kwargs):
+    by_author = Counter(post.author_id for post in posts)
+    by_group = Counter(
+        post.group_id for post in posts if post.group_id is not None
+    )
+    deltas = Counter({feed_key(INDEX_FEED): len(posts)})
+    for author_id, amount in by_author.items():
+        change_user_stats(author_id, posts_count=amount)
+        deltas[feed_key('author', author_id)] += amount
+    for group_id, amount in by_group.items():
+        deltas[feed_key('group', group_id)] += amount
+    for key, delta in deltas.items():
+        bump_feed_counts([key], delta)
+    # only some databases return primary keys from bulk_create
+    for post in posts:
+        if post.image:
+            claim_image(post.image.name)
+        if fan_out and post.pk is not None:
+            fan_out_post(post)
+            plan_post_thumbnails(sender, post)
+
+
+@receiver(post_save, sender=Post)
+def deliver_new_post(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    fan_out_deletion(instance)
+
+
+@receiver(post_save, sender=Post)
+def plan_post_thumbnails(sender, instance, **kwargs):
+    if instance.image and not instance.image_widths:
+        schedule_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, created, **kwargs):
+    previous = '' if created else getattr(instance, '_previous_image', '')
+    current = instance.image.name or ''
+    if previous == current:
+        return
+    if current:
+        claim_image(current)
+    if previous:
+        forget_image(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_post_image(sender, instance, **kwargs):
+    if instance.image:
+        forget_image(instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def deliver_followed_author(sender, instance, created, **kwargs):
+    if created:
+        fan_in_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def drop_unfollowed_author(sender, instance, **kwargs):
+    drop_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def outdate_post_fragments(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    bump_versions(post_version_keys(instance, [previous_group_id]))
+
+
+@receiver(posts_bulk_created, sender=Post)
+def outdate_bulk_created_fragments(sender, posts, **kwargs):
+    keys = set()
+    for post in posts:
+        keys.update(post_version_keys(post))
+    bump_versions(keys)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def outdate_commented_post_fragments(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).only(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        bump_versions(post_version_keys(post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def outdate_group_fragments(sender, instance, **kwargs):
+    bump_versions([
+        version_key('groups'), version_key('group', instance.pk)
+    ])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def outdate_follow_fragments(sender, instance, **kwargs):
+    bump_versions([
+        version_key('follow', instance.user_id),
+        version_key('author', instance.user_id),
+        version_key('author', instance.author_id),
+    ])
@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    """Return sha256 hex digest of a file read chunk by chunk."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """Return name of content with digest in the directory of name."""
+    directory = os.path.dirname(name)
+    _, extension = os.path.splitext(name)
+    return os.path.join(
+        directory, digest[:2], f'{digest}{extension.lower()}'
+    )
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage naming files by the hash of their content.
+
+    Byte-identical uploads get one name and share a single file with
+    its variants and thumbnails. Files are never overwritten, their
+    deletion is decided by StoredImage reference counts.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
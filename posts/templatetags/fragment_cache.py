@@ -0,0 +1,66 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from posts.fragments import FRAGMENT_GRACE, get_or_rebuild
+
+
+register = template.Library()
+
+
+class StaleCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, grace, fragment_name, vary_on,
+                 version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.grace = grace
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        timeout = int(self.timeout.resolve(context))
+        grace = self.grace.resolve(context)
+        grace = FRAGMENT_GRACE if grace is None else int(grace)
+        version = self.version.resolve(context) if self.version else None
+        key = make_template_fragment_key(
+            self.fragment_name, [var.resolve(context) for var in self.vary_on]
+        )
+        return get_or_rebuild(
+            key,
+            lambda: self.nodelist.render(context),
+            timeout,
+            grace,
+            version,
+        )
+
+
+@register.tag
+def stale_cache(parser, token):
+    """Cache a fragment like `{% cache %}` rebuilding it by one request.
+
+    Usage::
+
+        {% stale_cache timeout grace name [var1 var2 ...] [version=var] %}
+            ...
+        {% endstale_cache %}
+
+    Other requests get the outdated fragment while it is being rebuilt.
+    """
+    nodelist = parser.parse(('endstale_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    version = None
+    if bits[-1].startswith('version='):
+        version = parser.compile_filter(bits.pop()[len('version='):])
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag requires at least three arguments.'
+        )
+    return StaleCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        bits[3],
+        [parser.compile_filter(bit) for bit in bits[4:]],
+        version,
+    )
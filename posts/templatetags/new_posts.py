@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+
+from posts.paginators import encode_cursor
+
+
+register = template.Library()
+
+
+@register.inclusion_tag('include/new_posts.html')
+def new_posts_banner(page, url):
+    """Render the hidden "new posts" link of the first page of a feed.
+
+    The script in base.html polls url with the cursor of the newest post
+    and shows the link once something newer appears. It long-polls only
+    with NEW_POSTS_LONG_POLL on.
+    """
+    posts = list(page)
+    if not posts or page.has_previous():
+        return {'cursor': None}
+    return {
+        'url': url,
+        'cursor': encode_cursor(posts[0]),
+        'long_poll': settings.NEW_POSTS_LONG_POLL,
+    }
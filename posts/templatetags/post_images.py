@@ -0,0 +1,45 @@
+from django import template
+
+from posts.thumbnails import (POST_THUMBNAILS, prefetch_thumbnails,
+                              ready_thumbnail, schedule_thumbnails)
+from posts.variants import picture
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, name):
+    """Return built thumbnail of the post image or None.
+
+    A missing thumbnail is planned for building, the template shows
+    a placeholder meanwhile instead of resizing the image in request.
+    """
+    if not post.image:
+        return None
+    prefetched = getattr(post, 'thumbnails', {})
+    if name in prefetched:
+        return prefetched[name]
+    thumbnail = ready_thumbnail(post.image, name)
+    if thumbnail is None:
+        schedule_thumbnails(post.pk)
+    return thumbnail
+
+
+@register.simple_tag
+def prefetch_page_thumbnails(posts):
+    """Look up thumbnails of every post on the page in one go.
+
+    Put it before the loop rendering `posts/post_item.html`, so the cards
+    do not ask the key-value store one by one.
+    """
+    prefetch_thumbnails(posts, list(POST_THUMBNAILS))
+    return ''
+
+
+@register.simple_tag
+def post_picture(post):
+    """Return srcset context of the post image variants or None."""
+    if not post.image or not post.image_widths:
+        return None
+    return picture(post)
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.timeline import deliver_author
+
+
+User = get_user_model()
+PER_PAGE = settings.PER_PAGE
+API_INDEX_URL = reverse('api_index')
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='quin')
+        cls.reader = User.objects.create(username='rosa')
+        cls.group = Group.objects.create(
+            title='Api group',
+            description='About api group',
+            slug='api-group',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.bulk_create(
+            Post(text=f'Api post {i}', author=cls.author, group=cls.group)
+            for i in range(PER_PAGE + 3)
+        )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-pk'))
+        deliver_author(cls.reader.pk, cls.author.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedApiTests.reader)
+
+    def test_cursor_links_walk_through_feed(self):
+        """`next` and `previous` links lead to the neighbour pages."""
+        first = self.guest_client.get(API_INDEX_URL).json()
+        ids = [post['id'] for post in first['results']]
+        self.assertEqual(ids, [post.pk for post in self.posts[:PER_PAGE]])
+        self.assertIsNone(first['previous'])
+        second = self.guest_client.get(first['next']).json()
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.pk for post in self.posts[PER_PAGE:]],
+        )
+        self.assertIsNone(second['next'])
+        back = self.guest_client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_every_feed_serves_json(self):
+        """Index, group, profile and follow feeds return the posts."""
+        post = self.posts[0]
+        urls = [
+            (self.guest_client, API_INDEX_URL),
+            (self.guest_client, reverse('api_group', args=['api-group'])),
+            (self.guest_client, reverse('api_profile', args=['quin'])),
+            (self.reader_client, reverse('api_follow_index')),
+        ]
+        for client, url in urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                data = response.json()['results'][0]
+                self.assertEqual(data['id'], post.pk)
+                self.assertEqual(data['author'], 'quin')
+                self.assertEqual(data['group'], 'api-group')
+
+    def test_profile_of_user_named_like_an_endpoint(self):
+        """Authors named `posts`, `stats` or `follow` keep their feed."""
+        for name in ('posts', 'stats', 'follow'):
+            author = User.objects.create(username=name)
+            post = Post.objects.create(text=f'By {name}', author=author)
+            with self.subTest(name=name):
+                response = self.guest_client.get(
+                    reverse('api_profile', args=[name])
+                )
+                self.assertEqual(response.json()['results'][0]['id'], post.pk)
+
+    def test_sparse_fields(self):
+        """`fields` limits every post to the named fields."""
+        response = self.guest_client.get(API_INDEX_URL, {'fields': 'id,text'})
+        for data in response.json()['results']:
+            self.assertEqual(set(data), {'id', 'text'})
+        self.assertIn('fields=id%2Ctext', response.json()['next'])
+        response = self.guest_client.get(API_INDEX_URL, {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_costs_one_query(self):
+        """Posts of a page come with authors and groups in one query."""
+        self.reader_client.get(API_INDEX_URL)
+        # the session, its user and the page
+        with self.assertNumQueries(3):
+            self.reader_client.get(API_INDEX_URL)
+
+    def test_post_with_comments(self):
+        """The post comes with its comments."""
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Hi')
+        response = self.guest_client.get(
+            reverse('api_post', args=['quin', post.pk])
+        )
+        data = response.json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['comments'][0]['author'], 'rosa')
+        self.assertEqual(data['comments_count'], 1)
+
+    def test_missing_objects_and_anonymous_follow(self):
+        """Errors are returned as JSON too."""
+        response = self.guest_client.get(reverse('api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+        response = self.guest_client.get(reverse('api_profile', args=['x']))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
@@ -0,0 +1,68 @@
+import time
+
+from django.core.cache import cache, caches
+from django.test import TestCase
+
+from yatube.cache import INCR_LOCK_PREFIX, TwoTierCache, stamp_key
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shared = caches['shared']
+
+    def test_second_read_is_served_by_local_tier(self):
+        """Value read once comes from L1 until it changes."""
+        self.shared.set('tier_key', 'shared value')
+        before = cache.get_stats()
+        self.assertEqual(cache.get('tier_key'), 'shared value')
+        self.assertEqual(cache.get('tier_key'), 'shared value')
+        after = cache.get_stats()
+        self.assertEqual(after['l2_hits'] - before['l2_hits'], 1)
+        self.assertEqual(after['l1_hits'] - before['l1_hits'], 1)
+
+    def test_foreign_stamp_drops_local_tier(self):
+        """Write of another process is seen after the stamp check."""
+        cache.set('tier:key', 'old value')
+        self.shared.set('tier:key', 'new value')
+        self.shared.set(stamp_key('tier'), 'written by another worker', None)
+        cache.store.checked = time.monotonic()
+        self.assertEqual(cache.get('tier:key'), 'old value')
+        cache.store.checked = 0
+        self.assertEqual(cache.get('tier:key'), 'new value')
+
+    def test_foreign_stamp_keeps_other_namespaces(self):
+        """Only values of the written namespace leave L1."""
+        cache.set('tier:key', 'tier value')
+        cache.set('other:key', 'other value')
+        self.shared.set('other:key', 'changed value')
+        self.shared.set(stamp_key('tier'), 'written by another worker', None)
+        cache.store.checked = 0
+        cache.get('tier:key')
+        self.assertEqual(cache.get('other:key'), 'other value')
+
+    def test_immutable_and_shared_only_keys_write_no_stamp(self):
+        """Page cache fills and lock changes leave stamps alone."""
+        cache.set('anonymous_page:digest', 'page')
+        self.assertIsNone(self.shared.get(stamp_key('anonymous_page')))
+        cache.add('rebuild_lock:key', 1)
+        cache.delete('rebuild_lock:key')
+        self.assertIsNone(self.shared.get(stamp_key('rebuild_lock')))
+        self.assertIsNone(cache.get('rebuild_lock:key'))
+
+    def test_incr_releases_its_lock(self):
+        """Increment goes through L2 under a lock taken per key."""
+        cache.set('tier:count', 5)
+        self.assertEqual(cache.incr('tier:count', 2), 7)
+        self.assertEqual(self.shared.get('tier:count'), 7)
+        self.assertIsNone(self.shared.get(f'{INCR_LOCK_PREFIX}tier:count'))
+
+    def test_local_tier_is_bounded(self):
+        """L1 keeps no more than L1_MAX_ENTRIES values."""
+        bounded = TwoTierCache('bounded', {
+            'OPTIONS': {'L2': 'shared', 'L1_MAX_ENTRIES': 2},
+        })
+        for i in range(5):
+            bounded.set(f'bounded_{i}', i)
+        self.assertEqual(len(bounded.store.values), 2)
+        self.assertEqual(bounded.get('bounded_0'), 0)
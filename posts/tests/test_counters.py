@@ -0,0 +1,118 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.counters import get_author_stats
+from posts.models import Comment, Follow, Post, UserStats
+
+
+User = get_user_model()
+
+
+class StoredCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='ann')
+        cls.reader = User.objects.create(username='ben')
+        cls.post = Post.objects.create(text='Counted post', author=cls.author)
+
+    def setUp(self):
+        self.client_reader = Client()
+        self.client_reader.force_login(StoredCountersTests.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_write_paths_keep_counters(self):
+        """Follow, comment and unfollow change stored counters."""
+        author = StoredCountersTests.author
+        reader = StoredCountersTests.reader
+        post = StoredCountersTests.post
+        self.client_reader.get(
+            reverse('profile_follow', args=[author.username])
+        )
+        self.client_reader.post(
+            reverse('add_comment', args=[author.username, post.id]),
+            {'text': 'Counted comment'},
+        )
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(self.stats(reader).followings_count, 1)
+        self.assertEqual(self.stats(author).posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.client_reader.get(
+            reverse('profile_unfollow', args=[author.username])
+        )
+        self.assertEqual(self.stats(author).followers_count, 0)
+        self.assertEqual(self.stats(reader).followings_count, 0)
+
+    def test_drifted_counters_stay_positive(self):
+        """Deleting rows the counters never saw leaves them at zero."""
+        author = StoredCountersTests.author
+        reader = StoredCountersTests.reader
+        Follow.objects.bulk_create([Follow(user=reader, author=author)])
+        Follow.objects.filter(user=reader).delete()
+        Comment.objects.bulk_create([Comment(
+            post=StoredCountersTests.post, author=reader, text='Bulk'
+        )])
+        Comment.objects.filter(author=reader).delete()
+        self.assertEqual(self.stats(author).followers_count, 0)
+        self.assertEqual(self.stats(reader).followings_count, 0)
+        StoredCountersTests.post.refresh_from_db()
+        self.assertEqual(StoredCountersTests.post.comments_count, 0)
+
+    def test_post_edit_keeps_comments_count(self):
+        """Saving a post loaded before a comment does not lose it."""
+        post = Post.objects.get(pk=StoredCountersTests.post.pk)
+        Comment.objects.create(
+            text='Counted comment',
+            author=StoredCountersTests.reader,
+            post=post,
+        )
+        post.text = 'Edited counted post'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_rebuild_counters_command(self):
+        """Command restores broken and missing counters."""
+        author = StoredCountersTests.author
+        Post.objects.update(comments_count=7)
+        UserStats.objects.filter(user=author).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.stats(author).posts_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=StoredCountersTests.post.pk).comments_count,
+            0,
+        )
+
+    def test_author_sidebar_is_shared_by_profile_and_post(self):
+        """Profile and post pages get counters and the follow flag."""
+        author = StoredCountersTests.author
+        post = StoredCountersTests.post
+        Follow.objects.create(user=StoredCountersTests.reader, author=author)
+        cache.clear()
+        urls = (
+            reverse('profile', args=[author.username]),
+            reverse('post', args=[author.username, post.id]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client_reader.get(url)
+                self.assertEqual(response.context['posts_count'], 1)
+                self.assertEqual(response.context['followers_count'], 1)
+                self.assertTrue(response.context['is_following'])
+                self.assertContains(response, 'Отписаться')
+
+    def test_author_stats_are_cached(self):
+        """Second read of the author counters makes no query."""
+        author = StoredCountersTests.author
+        cache.clear()
+        get_author_stats(author)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_author_stats(author)['posts_count'], 1)
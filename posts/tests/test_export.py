@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.export import buffered, export_lines
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+EXPORT_URL = reverse('admin:posts_post_export')
+
+
+def parse(data):
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='sid')
+        cls.admin = User.objects.create_superuser(
+            username='tea', email='tea@example.com', password='secret'
+        )
+        group = Group.objects.create(
+            title='Export group',
+            description='About export group',
+            slug='export',
+        )
+        cls.old = Post.objects.create(text='Старая запись', author=cls.author)
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=2)
+        )
+        cls.new = Post.objects.create(
+            text='New post', author=cls.author, group=group
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.new, author=cls.admin, text='Comment'
+        )
+
+    def test_lines_of_posts_and_comments(self):
+        """Every row becomes one JSON line marked with its type."""
+        rows = parse(b''.join(export_lines(chunk_size=1)))
+        self.assertEqual(
+            [(row['type'], row['id']) for row in rows],
+            [('post', self.old.pk), ('post', self.new.pk),
+             ('comment', self.comment.pk)],
+        )
+        self.assertEqual(rows[0]['text'], 'Старая запись')
+        self.assertEqual(rows[1]['group'], 'export')
+        self.assertEqual(rows[2]['post'], self.new.pk)
+
+    def test_small_lines_are_buffered(self):
+        """Lines are written out in blocks, not one by one."""
+        blocks = list(buffered([b'a' * 10] * 5, size=25))
+        self.assertEqual([len(block) for block in blocks], [30, 20])
+
+    def test_command_exports_since_watermark_into_gzip(self):
+        """--since skips older rows, --gzip compresses the file."""
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        err = StringIO()
+        call_command(
+            'export_posts', '--since', since, '--gzip', '--output', path,
+            stderr=err,
+        )
+        with gzip.open(path) as file:
+            rows = parse(file.read())
+        self.assertEqual(
+            [row['id'] for row in rows if row['type'] == 'post'],
+            [self.new.pk],
+        )
+        self.assertIn('Exported 1 posts and 1 comments', err.getvalue())
+
+    def test_admin_endpoint_streams_to_superusers(self):
+        """Superusers get a streaming download, others are refused."""
+        client = Client()
+        client.force_login(self.author)
+        self.assertNotEqual(client.get(EXPORT_URL).status_code, 200)
+        client.force_login(self.admin)
+        response = client.get(EXPORT_URL, {'gzip': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = parse(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(len(rows), 3)
+        response = client.get(EXPORT_URL, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
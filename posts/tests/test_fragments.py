@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.fragments import acquire_rebuild_lock, get_or_rebuild
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.build = mock.Mock(return_value='new fragment')
+
+    def test_fresh_value_is_not_rebuilt(self):
+        """Fresh value of the same version is served from the cache."""
+        get_or_rebuild('swr_key', self.build, 60, version=1)
+        get_or_rebuild('swr_key', self.build, 60, version=1)
+        self.assertEqual(self.build.call_count, 1)
+
+    def test_outdated_value_is_served_while_rebuilt(self):
+        """Only the lock holder rebuilds, others get the old value."""
+        cache.set('swr_key', (1, 0, 'old fragment'))
+        acquire_rebuild_lock('swr_key')
+        value = get_or_rebuild('swr_key', self.build, 60, version=2)
+        self.assertEqual(value, 'old fragment')
+        self.build.assert_not_called()
+        cache.delete('rebuild_lock:swr_key')
+        value = get_or_rebuild('swr_key', self.build, 60, version=2)
+        self.assertEqual(value, 'new fragment')
+
+    def test_expired_value_is_rebuilt_after_grace(self):
+        """Value expired longer than grace ago is not served."""
+        cache.set('swr_key', (1, 0, 'old fragment'))
+        value = get_or_rebuild('swr_key', self.build, 60, grace=0, version=1)
+        self.assertEqual(value, 'new fragment')
+
+    @mock.patch('posts.fragments.REBUILD_WAIT', 0.1)
+    def test_waiter_does_not_serve_value_past_grace(self):
+        """Waiting for a rebuild never returns a value expired too long."""
+        cache.set('swr_key', (1, 0, 'old fragment'))
+        acquire_rebuild_lock('swr_key')
+        value = get_or_rebuild('swr_key', self.build, 60, grace=0, version=1)
+        self.assertEqual(value, 'new fragment')
+
+    def test_stale_cache_tag(self):
+        """Tag renders its content once per version."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% stale_cache 60 5 tag_test name version=version %}'
+            '{{ name }}-{{ version }}{% endstale_cache %}'
+        )
+        first = template.render(Context({'name': 'a', 'version': 1}))
+        self.assertEqual(first, 'a-1')
+        cached = Template(
+            '{% load fragment_cache %}'
+            '{% stale_cache 60 5 tag_test name version=version %}'
+            'rebuilt{% endstale_cache %}'
+        )
+        context = Context({'name': 'a', 'version': 1})
+        self.assertEqual(cached.render(context), 'a-1')
+        context = Context({'name': 'a', 'version': 2})
+        self.assertEqual(cached.render(context), 'rebuilt')
+
+
+class FeedFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='feeder')
+        group = Group.objects.create(
+            title='Fragment group', description='About', slug='fragment'
+        )
+        Post.objects.create(text='Grouped post', author=author, group=group)
+        Post.objects.create(text='Index only post', author=author)
+        self.client = Client()
+        self.client.force_login(author)
+
+    @mock.patch('posts.fragments.REBUILD_WAIT', 0)
+    def test_feeds_do_not_share_fragments(self):
+        """A busy rebuild never serves one feed in place of another."""
+        self.client.get(reverse('index'))
+        with mock.patch(
+            'posts.fragments.acquire_rebuild_lock', return_value=False
+        ):
+            response = self.client.get(reverse('group', args=['fragment']))
+        self.assertContains(response, 'Grouped post')
+        self.assertNotContains(response, 'Index only post')
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.importer import Importer
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='uma')
+        self.reader = User.objects.create(username='vic')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def write_jsonl(self, rows):
+        return self.write(
+            'content.jsonl', ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_content', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_every_type_is_imported_with_dates(self):
+        """Groups, posts, comments and follows are saved in batches."""
+        path = self.write_jsonl([
+            {'type': 'group', 'title': 'Old', 'slug': 'old'},
+            {'type': 'post', 'id': 500, 'text': 'Imported', 'author': 'uma',
+             'group': 'old', 'pub_date': '2015-03-01T10:00:00+00:00'},
+            {'type': 'comment', 'post': 500, 'author': 'vic', 'text': 'Hi',
+             'created': '2015-03-02T10:00:00+00:00'},
+            {'type': 'follow', 'user': 'vic', 'author': 'uma'},
+            {'type': 'post', 'text': 'Nobody', 'author': 'ghost'},
+        ])
+        out, err = self.run_import(path, '--batch-size', '2')
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.group, Group.objects.get(slug='old'))
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 2)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post)
+        )
+        self.assertIn('Unknown user ghost', err)
+        self.assertIn('rows/s', out)
+
+    def test_csv_with_type_and_created_users(self):
+        """CSV rows get --type, unknown authors are created on demand."""
+        path = self.write(
+            'posts.csv', 'text,author\nFirst,uma\nSecond,newcomer\n'
+        )
+        self.run_import(path, '--type', 'post', '--create-users')
+        self.assertEqual(
+            set(Post.objects.values_list('author__username', flat=True)),
+            {'uma', 'newcomer'},
+        )
+        self.assertFalse(
+            User.objects.get(username='newcomer').has_usable_password()
+        )
+
+    def test_interrupted_import_resumes_from_checkpoint(self):
+        """A rerun starts after the last saved batch without duplicates."""
+        path = self.write_jsonl([
+            {'type': 'post', 'id': i, 'text': f'Post {i}', 'author': 'uma'}
+            for i in range(1, 7)
+        ])
+        original = Importer.import_batch
+        calls = []
+
+        def failing(importer, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise OSError('Disk is gone')
+            return original(importer, rows)
+
+        with mock.patch.object(Importer, 'import_batch', failing):
+            with self.assertRaises(CommandError):
+                self.run_import(path, '--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 2)
+        out, _ = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Resuming after line 2', out)
+        self.assertEqual(
+            sorted(Post.objects.values_list('pk', flat=True)),
+            [1, 2, 3, 4, 5, 6],
+        )
+
+    def test_posts_reach_timelines_in_one_step(self):
+        """Imported posts are delivered to followers by batch, not by row."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        path = self.write_jsonl([
+            {'type': 'post', 'text': f'Followed {i}', 'author': 'uma'}
+            for i in range(5)
+        ])
+        self.run_import(path)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5
+        )
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        response = reader_client.get(reverse('follow_index'))
+        self.assertContains(response, 'Followed 4')
+
+        def import_queries(first_id, amount):
+            path = self.write_jsonl([
+                {'type': 'post', 'id': first_id + i, 'text': 'Counted',
+                 'author': 'uma'}
+                for i in range(amount)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import(path, '--checkpoint', f'{path}.{first_id}')
+            return len(queries)
+
+        self.assertEqual(import_queries(100, 10), import_queries(200, 80))
+
+    def test_follows_reach_timelines_in_one_step(self):
+        """New follows get posts by batch, existing ones are not counted."""
+        Post.objects.create(text='Followed', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        names = [f'reader{i}' for i in range(80)]
+        User.objects.bulk_create(User(username=name) for name in names)
+
+        def import_queries(names, checkpoint):
+            path = self.write_jsonl([
+                {'type': 'follow', 'user': name, 'author': 'uma'}
+                for name in names
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                out, _ = self.run_import(
+                    path, '--checkpoint', f'{path}.{checkpoint}'
+                )
+            return len(queries), out
+
+        _, out = import_queries(['vic', 'reader0'], 'two')
+        self.assertIn(' 1 follows ', out)
+        self.assertIn('1 rows skipped', out)
+        few, _ = import_queries(names[1:10], 'ten')
+        many, _ = import_queries(names[10:], 'seventy')
+        self.assertEqual(many, few)
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user__username__startswith='reader'
+            ).count(),
+            80,
+        )
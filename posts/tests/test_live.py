@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.live import hub, refresh_watermark
+from posts.models import Comment, Post
+
+
+User = get_user_model()
+STATS_URL = reverse('api_stats')
+
+
+def run_on_commit(func):
+    func()
+
+
+@mock.patch('posts.live.CHECK_INTERVAL', 0.01)
+class LiveCommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='yan')
+        cls.reader = User.objects.create(username='zoe')
+        cls.post = Post.objects.create(text='Live post', author=cls.author)
+        cls.url = reverse('comment_stream', args=['yan', cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def comment(self, text):
+        return Comment.objects.create(
+            post=self.post, author=self.reader, text=text
+        )
+
+    def open_stream(self, **params):
+        response = self.guest_client.get(self.url, params)
+        self.addCleanup(response.close)
+        return response, iter(response.streaming_content)
+
+    @mock.patch('posts.live.MAX_AGE', 0)
+    def test_stream_catches_up_and_releases_connection(self):
+        """Comments after `after` are sent, the connection is freed."""
+        first = self.comment('First')
+        second = self.comment('Second')
+        connections = hub.get_stats()['connections']
+        response = self.guest_client.get(self.url, {'after': first.pk})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(hub.get_stats()['connections'], connections + 1)
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('retry: '))
+        self.assertIn(f'id: {second.pk}\nevent: comment\n', content)
+        self.assertNotIn(f'id: {first.pk}\n', content)
+        self.assertEqual(hub.get_stats()['connections'], connections)
+
+    @mock.patch('posts.live.transaction.on_commit', run_on_commit)
+    def test_new_comment_wakes_stream(self):
+        """A comment saved in this process is pushed to its subscribers."""
+        response, events = self.open_stream(after=0)
+        next(events)
+        self.assertEqual(next(events), b': keep-alive\n\n')
+        # the watermark stays behind, only the wake-up tells of the comment
+        with mock.patch('posts.live.refresh_watermark'):
+            comment = self.comment('Pushed')
+        self.assertIn(f'id: {comment.pk}\n', next(events).decode())
+
+    @mock.patch('posts.live.transaction.on_commit', lambda func: None)
+    def test_watermark_wakes_stream_of_other_worker(self):
+        """A comment of another worker is noticed through the cache."""
+        response, events = self.open_stream()
+        next(events)
+        self.assertEqual(next(events), b': keep-alive\n\n')
+        comment = self.comment('Elsewhere')
+        self.assertEqual(next(events), b': keep-alive\n\n')
+        refresh_watermark(self.post.pk)
+        self.assertIn(f'id: {comment.pk}\n', next(events).decode())
+
+    def test_connections_are_a_share_of_server_threads(self):
+        """Streams never take every thread of the server process."""
+        self.assertLess(hub.max_connections, settings.SERVER_THREADS)
+
+    def test_too_many_connections(self):
+        """Subscribers above the limit are asked to come back later."""
+        with mock.patch.object(hub, 'max_connections', 0):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_post_page_subscribes_after_last_comment(self):
+        """The post page tells the script where its stream starts."""
+        comment = self.comment('Shown')
+        response = self.guest_client.get(
+            reverse('post', args=['yan', self.post.pk])
+        )
+        self.assertContains(response, f'data-url="{self.url}"')
+        self.assertContains(response, f'data-after="{comment.pk}"')
+        self.assertContains(response, 'id="comments-live"')
+
+    def test_stats_are_staff_only(self):
+        """Only staff gets the counters of the process."""
+        response = self.guest_client.get(STATS_URL)
+        self.assertEqual(response.status_code, 403)
+        staff = User.objects.create(username='admin', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        data = staff_client.get(STATS_URL).json()
+        self.assertIn('peak_connections', data['live_comments'])
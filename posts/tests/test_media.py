@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import Client, SimpleTestCase, override_settings
+
+from yatube.storage import HashedStaticFilesStorage
+
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'0123456789'
+URL = '/media/posts/ab/file.gif'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts', 'ab'))
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'ab', 'file.gif'),
+                  'wb') as file:
+            file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_whole_file_is_cached_for_long(self):
+        """File is sent with validators and immutable caching."""
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        repeated = self.client.get(
+            URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_byte_ranges(self):
+        """Single ranges are answered with the asked part of the file."""
+        ranges = {
+            'bytes=2-5': ('2345', 'bytes 2-5/10'),
+            'bytes=7-': ('789', 'bytes 7-9/10'),
+            'bytes=-3': ('789', 'bytes 7-9/10'),
+            'bytes=8-100': ('89', 'bytes 8-9/10'),
+        }
+        for header, (content, content_range) in ranges.items():
+            with self.subTest(header=header):
+                response = self.client.get(URL, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(
+                    b''.join(response.streaming_content), content.encode()
+                )
+        response = self.client.get(URL, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_front_server_gets_the_file(self):
+        """With acceleration only a header pointing to the file is sent."""
+        with mock.patch('yatube.media.ACCEL', 'x-accel-redirect'):
+            response = self.client.get(URL)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/ab/file.gif'
+        )
+        self.assertEqual(response.content, b'')
+        with mock.patch('yatube.media.ACCEL', 'x-sendfile'):
+            response = self.client.get(URL)
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(MEDIA_ROOT, 'posts', 'ab', 'file.gif'),
+        )
+
+    def test_files_outside_media_are_not_found(self):
+        """Paths leaving MEDIA_ROOT and directories are 404."""
+        for url in ('/media/../manage.py', '/media/posts/ab/',
+                    '/media/posts/missing.gif'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class HashedStaticFilesTests(SimpleTestCase):
+    def test_collected_files_get_hashed_names(self):
+        """Collected files are named by hash, missing ones keep names."""
+        root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        os.makedirs(os.path.join(root, 'css'))
+        with open(os.path.join(root, 'css', 'site.css'), 'w') as file:
+            file.write('body { color: black; }')
+        storage = HashedStaticFilesStorage(location=root, base_url='/s/')
+        self.assertRegex(
+            storage.url('css/site.css'), r'^/s/css/site\.[0-9a-f]{12}\.css$'
+        )
+        self.assertEqual(storage.url('css/missing.css'), '/s/css/missing.css')
@@ -4,9 +4,10 @@ import tempfile
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from posts.models import Group, Post, Comment
+from posts.models import Group, Post, Comment, Follow
 
 
 User = get_user_model()
@@ -117,3 +118,13 @@ class GroupModelTest(TestCase):
 
     def test_group_name_is_title_field(self):
         self.assertEqual(GroupModelTest.group.title, str(GroupModelTest.group))
+
+
+class FollowModelTest(TestCase):
+    def test_user_follows_author_only_once(self):
+        """Second Follow between the same users is rejected."""
+        user = User.objects.create(username='Petya')
+        author = User.objects.create(username='Masha')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=user, author=author)
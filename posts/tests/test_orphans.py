@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts.models import Post, StoredImage
+from posts.orphans import LiveMedia, find_orphans, still_used
+
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+OLD = time.time() - 2 * 60 * 60
+
+
+def upload(name):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), (10, 90, 160)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def store(name, old=True):
+    """Write a small file into media and return its name."""
+    name = default_storage.save(name, ContentFile(b'data'))
+    if old:
+        os.utime(default_storage.path(name), (OLD, OLD))
+    return name
+
+
+def register_thumbnail(source_name, thumbnail_name):
+    """Record in the kvstore that thumbnail_name was built of the source."""
+    storage = Post._meta.get_field('image').storage
+    source = ImageFile(source_name, storage)
+    thumbnail = ImageFile(thumbnail_name, default_storage)
+    source.set_size((40, 20))
+    thumbnail.set_size((20, 10))
+    default.kvstore._set(source.key, source)
+    default.kvstore._set(thumbnail.key, thumbnail)
+    default.kvstore._set(source.key, [thumbnail.key], identity='thumbnails')
+    return source.key
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch('posts.thumbnails.run_in_background')
+class MediaGarbageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='ida')
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Post with image',
+            author=self.author,
+            image=upload('live.jpg'),
+        )
+        live = self.post.image.name
+        root = os.path.splitext(live)[0]
+        os.utime(default_storage.path(live), (OLD, OLD))
+        self.live = [
+            live,
+            store(f'{root}.480w.webp'),
+            store('cache/aa/bb/live-card.jpg'),
+        ]
+        register_thumbnail(live, self.live[2])
+        StoredImage.objects.create(name='posts/de/dead.jpg', refs=0)
+        self.dead_source = register_thumbnail(
+            'posts/de/dead.jpg', 'cache/cc/dd/dead-card.jpg'
+        )
+        self.orphans = [
+            store('posts/de/dead.jpg'),
+            store('posts/de/dead.480w.webp'),
+            store('cache/cc/dd/dead-card.jpg'),
+        ]
+        self.fresh = store('posts/fr/fresh.jpg', old=False)
+
+    def tearDown(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(MEDIA_ROOT, name))
+
+    def test_orphans_are_found_without_query_per_file(
+            self, run_in_background):
+        """Live names are collected at once, files are checked in memory."""
+        for i in range(20):
+            store(f'posts/zz/extra{i}.jpg')
+        with self.assertNumQueries(3):
+            live = LiveMedia()
+        with self.assertNumQueries(0):
+            orphans = {name for name, _ in find_orphans(MEDIA_ROOT, live, 60)}
+        self.assertTrue(set(self.orphans) <= orphans)
+        self.assertEqual(len(orphans), len(self.orphans) + 20)
+        self.assertFalse(orphans & set(self.live))
+        self.assertNotIn(self.fresh, orphans)
+
+    def test_dry_run_only_reports(self, run_in_background):
+        """With --dry-run every orphan is listed and kept on disk."""
+        out = StringIO()
+        call_command('collect_media_garbage', '--dry-run', stdout=out)
+        for name in self.orphans:
+            self.assertIn(name, out.getvalue())
+            self.assertTrue(self.exists(name))
+        self.assertIn('Found 3 orphaned files', out.getvalue())
+
+    def test_orphans_and_their_records_are_deleted(self, run_in_background):
+        """Orphans go in batches, live and fresh files are kept."""
+        call_command(
+            'collect_media_garbage', '--batch-size', '2', stdout=StringIO()
+        )
+        for name in self.orphans:
+            self.assertFalse(self.exists(name))
+        for name in self.live + [self.fresh]:
+            self.assertTrue(self.exists(name))
+        self.assertFalse(
+            StoredImage.objects.filter(name='posts/de/dead.jpg').exists()
+        )
+        self.assertFalse(KVStoreModel.objects.filter(
+            key=add_prefix(self.dead_source, 'thumbnails')
+        ).exists())
+
+    def test_quarantine_keeps_paths(self, run_in_background):
+        """--quarantine moves orphans instead of deleting them."""
+        quarantine = os.path.join(MEDIA_ROOT, 'quarantine')
+        call_command(
+            'collect_media_garbage', '--quarantine', quarantine,
+            stdout=StringIO(),
+        )
+        for name in self.orphans:
+            self.assertFalse(self.exists(name))
+            self.assertTrue(os.path.exists(os.path.join(quarantine, name)))
+
+    def test_reused_orphan_is_kept(self, run_in_background):
+        """An orphan used by a post saved after the lookup stays."""
+        Post.objects.filter(pk=self.post.pk).update(image='posts/de/dead.jpg')
+        self.assertEqual(
+            still_used(self.orphans[:2]), set(self.orphans[:2])
+        )
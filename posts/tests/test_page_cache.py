@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='eve')
+        cls.post = Post.objects.create(text='Cached post', author=cls.author)
+        cls.post_url = reverse('post', args=[cls.author.username, cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(AnonymousPageCacheTests.author)
+
+    def test_repeat_visit_gets_not_modified(self):
+        """Guest sending back ETag of an unchanged page gets 304."""
+        for url in (reverse('index'), AnonymousPageCacheTests.post_url):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                repeated = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(repeated.status_code, 304)
+
+    def test_new_comment_changes_cached_page(self):
+        """Comment on the post makes its cached page outdated."""
+        url = AnonymousPageCacheTests.post_url
+        response = self.guest_client.get(url)
+        Comment.objects.create(
+            text='Fresh comment',
+            author=AnonymousPageCacheTests.author,
+            post=AnonymousPageCacheTests.post,
+        )
+        repeated = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(repeated.status_code, 200)
+        self.assertContains(repeated, 'Fresh comment')
+
+    def test_authorized_user_bypasses_page_cache(self):
+        """Pages of logged in users are neither cached nor tagged."""
+        response = self.author_client.get(reverse('index'))
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Новая запись')
+
+    def test_renamed_author_page_is_not_served(self):
+        """Old names of renamed or deleted authors lose their pages."""
+        author = User.objects.create(username='renamed')
+        url = reverse('profile', args=['renamed'])
+        self.assertEqual(self.guest_client.get(url).status_code, 200)
+        author.username = 'newname'
+        author.save()
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+        url = reverse('profile', args=['newname'])
+        self.guest_client.get(url)
+        author.delete()
+        stranger = User.objects.create(username='newname')
+        Post.objects.create(text='Stranger post', author=stranger)
+        self.assertContains(self.guest_client.get(url), 'Stranger post')
@@ -0,0 +1,154 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, TimelineEntry
+from posts.paginators import (CursorPaginator, FeedPaginator,
+                              TimelinePaginator, decode_cursor, encode_cursor,
+                              feed_key)
+
+
+User = get_user_model()
+INDEX_URL = reverse('index')
+PER_PAGE = settings.PER_PAGE
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='leo')
+        Post.objects.bulk_create(
+            Post(text=f'Cursor post {i}', author=cls.author)
+            for i in range(PER_PAGE * 2 + 3)
+        )
+        cls.posts = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_round_trip(self):
+        """Decoded cursor points to the same post it was built from."""
+        post = CursorPaginatorTests.posts[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)),
+            (post.pub_date, post.pk),
+        )
+        self.assertIsNone(decode_cursor('broken-cursor'))
+
+    def test_before_and_after_walk_through_feed(self):
+        """Following next and previous cursors visits every post once."""
+        posts = CursorPaginatorTests.posts
+        first = self.guest_client.get(INDEX_URL).context['page']
+        self.assertEqual(list(first), posts[:PER_PAGE])
+        self.assertFalse(first.has_previous())
+        second = self.guest_client.get(
+            INDEX_URL, {'before': first.next_cursor}
+        ).context['page']
+        self.assertEqual(list(second), posts[PER_PAGE:PER_PAGE * 2])
+        last = self.guest_client.get(
+            INDEX_URL, {'before': second.next_cursor}
+        ).context['page']
+        self.assertEqual(list(last), posts[PER_PAGE * 2:])
+        self.assertFalse(last.has_next())
+        back = self.guest_client.get(
+            INDEX_URL, {'after': last.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back), posts[PER_PAGE:PER_PAGE * 2])
+
+    def test_page_number_links_keep_working(self):
+        """Old `?page=N` links are served with offset pagination."""
+        response = self.guest_client.get(INDEX_URL, {'page': 2})
+        page = response.context['page']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), CursorPaginatorTests.posts[
+            PER_PAGE:PER_PAGE * 2
+        ])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan format of SQLite')
+    def test_seek_searches_index_range(self):
+        """Seeking never scans the index from its start, whatever depth."""
+        position = (CursorPaginatorTests.posts[-1].pub_date, 1)
+        paginators = [
+            CursorPaginator(Post.objects.all(), PER_PAGE),
+            TimelinePaginator(
+                TimelineEntry.objects.filter(user=self.author), PER_PAGE
+            ),
+        ]
+        for paginator in paginators:
+            for lookup in ('lt', 'gt'):
+                rows = paginator.object_list.filter(
+                    paginator.seek(lookup, position)
+                )[:PER_PAGE + 1]
+                sql, params = rows.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                with self.subTest(paginator=paginator, lookup=lookup):
+                    self.assertIn('SEARCH', plan)
+                    self.assertNotIn('SCAN', plan)
+
+
+class FeedPaginatorCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='mia')
+        cls.reader = User.objects.create(username='ned')
+        cls.group = Group.objects.create(
+            title='Counted group',
+            description='About counted group',
+            slug='counted',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self, feed):
+        return FeedPaginator(Post.objects.all(), PER_PAGE, feed=feed)
+
+    def test_cached_count_needs_no_query(self):
+        """Second paginator of the same feed takes its count from cache."""
+        Post.objects.create(text='Counted post', author=self.author)
+        self.assertEqual(self.paginator(feed_key('index')).count, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator(feed_key('index')).count, 1)
+
+    def test_post_signals_bump_every_feed_count(self):
+        """Creating and deleting a post changes counts of its feeds."""
+        keys = [
+            feed_key('index'),
+            feed_key('group', self.group.pk),
+            feed_key('author', self.author.pk),
+        ]
+        follow_key = feed_key('follow', self.reader.pk)
+        for key in keys:
+            cache.set(key, 5)
+        cache.set(follow_key, 5)
+        post = Post.objects.create(
+            text='Counted post', author=self.author, group=self.group
+        )
+        for key in keys:
+            with self.subTest(key=key):
+                self.assertEqual(cache.get(key), 6)
+        self.assertIsNone(cache.get(follow_key))
+        cache.set(follow_key, 6)
+        post.delete()
+        for key in keys:
+            with self.subTest(key=key):
+                self.assertEqual(cache.get(key), 5)
+        self.assertIsNone(cache.get(follow_key))
+
+    def test_follow_change_forgets_follow_feed_count(self):
+        """Following another author drops the cached follow feed count."""
+        key = feed_key('follow', self.reader.pk)
+        cache.set(key, 5)
+        Follow.objects.create(user=self.reader, author=self.reader)
+        self.assertIsNone(cache.get(key))
@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post
+
+
+User = get_user_model()
+INDEX_URL = reverse('index')
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name, size, exif=b''):
+    buffer = BytesIO()
+    Image.new('RGB', size, (30, 120, 200)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch('posts.thumbnails.run_in_background')
+class ImagePlaceholderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='una')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_saved_image_is_described(self, run_in_background):
+        """Size and a data URI placeholder are stored with the post."""
+        post = Post.objects.create(
+            text='Described post',
+            author=self.author,
+            image=upload('photo.jpg', (800, 600)),
+        )
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (800, 600))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertLess(len(post.image_placeholder), 1000)
+
+    def test_rotated_photo_size_follows_orientation(self, run_in_background):
+        """Width and height of a photo taken sideways are swapped."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        post = Post.objects.create(
+            text='Rotated post',
+            author=self.author,
+            image=upload('rotated.jpg', (800, 600), exif.tobytes()),
+        )
+        self.assertEqual((post.image_width, post.image_height), (600, 800))
+
+    def test_replaced_and_removed_image_change_description(
+            self, run_in_background):
+        """A new image is described again, no image clears the fields."""
+        post = Post.objects.create(
+            text='Changed post',
+            author=self.author,
+            image=upload('first.jpg', (800, 600)),
+        )
+        post.image = upload('second.jpg', (300, 500))
+        post.save()
+        self.assertEqual((post.image_width, post.image_height), (300, 500))
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_feed_renders_placeholder_without_opening_image(
+            self, run_in_background):
+        """The card shows the stored placeholder, files are not read."""
+        post = Post.objects.create(
+            text='Rendered post',
+            author=self.author,
+            image=upload('card.jpg', (800, 600)),
+        )
+        storage = Post._meta.get_field('image').storage
+        with mock.patch.object(storage, 'open', side_effect=AssertionError):
+            response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, post.image_placeholder)
+
+    def test_command_describes_bulk_created_posts(self, run_in_background):
+        """build_image_variants fills sizes of posts saved without them."""
+        post = Post.objects.create(
+            text='Bulk post',
+            author=self.author,
+            image=upload('bulk.jpg', (640, 480)),
+        )
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None, image_placeholder=''
+        )
+        call_command('build_image_variants', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (640, 480))
+        self.assertNotEqual(post.image_placeholder, '')
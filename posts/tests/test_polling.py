@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+from posts.paginators import encode_cursor
+from posts.polling import waiters
+from posts.timeline import deliver_author
+
+
+User = get_user_model()
+INDEX_URL = reverse('index')
+NEW_URL = reverse('api_index_new')
+
+
+class NewPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='wes')
+        cls.reader = User.objects.create(username='xia')
+        cls.group = Group.objects.create(
+            title='Polled group',
+            description='About polled group',
+            slug='polled',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.first = Post.objects.create(
+            text='First post', author=self.author, group=self.group
+        )
+        self.cursor = encode_cursor(self.first)
+
+    def publish(self, text):
+        return Post.objects.create(
+            text=text, author=self.author, group=self.group
+        )
+
+    def test_newer_posts_of_every_feed(self):
+        """Every feed tells ids of posts newer than the cursor."""
+        post = self.publish('Second post')
+        deliver_author(self.reader.pk, self.author.pk)
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        urls = [
+            (self.guest_client, NEW_URL),
+            (self.guest_client, reverse('api_group_new', args=['polled'])),
+            (reader_client, reverse('api_follow_index_new')),
+        ]
+        for client, url in urls:
+            with self.subTest(url=url):
+                data = client.get(url, {'after': self.cursor}).json()
+                self.assertEqual(data['count'], 1)
+                self.assertEqual(data['ids'], [post.pk])
+                self.assertEqual(data['cursor'], encode_cursor(post))
+
+    def test_unchanged_feed_is_answered_from_cache(self):
+        """Repeated polls of the same feed state cost no query."""
+        self.guest_client.get(NEW_URL, {'after': self.cursor})
+        with self.assertNumQueries(0):
+            data = self.guest_client.get(
+                NEW_URL, {'after': self.cursor}
+            ).json()
+        self.assertEqual(data['count'], 0)
+        self.publish('Second post')
+        data = self.guest_client.get(NEW_URL, {'after': self.cursor}).json()
+        self.assertEqual(data['count'], 1)
+
+    @mock.patch('posts.polling.time.sleep')
+    def test_long_poll_waits_for_a_new_post(self, sleep):
+        """With `wait` the answer comes once the count changes."""
+        sleep.side_effect = lambda seconds: self.publish('Waited post')
+        data = self.guest_client.get(
+            NEW_URL, {'after': self.cursor, 'wait': 1, 'known': 0}
+        ).json()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(data['count'], 1)
+
+    @mock.patch('posts.polling.WAIT_TIMEOUT', 0)
+    def test_long_poll_gives_up_after_timeout(self):
+        """Nothing new within the timeout returns the known count."""
+        data = self.guest_client.get(
+            NEW_URL, {'after': self.cursor, 'wait': 1, 'known': 0}
+        ).json()
+        self.assertEqual(data['count'], 0)
+
+    def test_long_polls_are_bounded(self):
+        """Without a free slot a long poll is refused, a plain one is not."""
+        with mock.patch.object(waiters, 'acquire', return_value=False):
+            response = self.guest_client.get(
+                NEW_URL, {'after': self.cursor, 'wait': 1, 'known': 0}
+            )
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response)
+            response = self.guest_client.get(NEW_URL, {'after': self.cursor})
+            self.assertEqual(response.status_code, 200)
+
+    def test_broken_cursor(self):
+        """A poll without a valid cursor is refused."""
+        response = self.guest_client.get(NEW_URL, {'after': 'broken'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_first_page_has_new_posts_link(self):
+        """Only the first page of a feed carries the polling link."""
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, f'data-cursor="{self.cursor}"')
+        self.assertContains(response, f'data-url="{NEW_URL}"')
+        self.assertNotContains(response, 'data-wait')
+        cache.clear()
+        with override_settings(NEW_POSTS_LONG_POLL=True):
+            response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'data-wait="1"')
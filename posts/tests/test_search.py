@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginators import encode_cursor, pack_cursor
+from posts.search import (FTS_TABLE, decode_rank_cursor, encode_rank_cursor,
+                          match_expression)
+
+
+User = get_user_model()
+SEARCH_URL = reverse('search')
+PER_PAGE = settings.PER_PAGE
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='ora')
+        cls.admin = User.objects.create_superuser(
+            username='pam', email='pam@example.com', password='secret'
+        )
+        cls.best = Post.objects.create(
+            text='кот кот кот', author=cls.author
+        )
+        cls.other = Post.objects.create(
+            text='Пёс и кот гуляют по длинной улице', author=cls.author
+        )
+        cls.dog = Post.objects.create(text='Только пёс', author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(SEARCH_URL, {'q': query, **params})
+        return list(response.context['page'])
+
+    def test_matches_are_ranked(self):
+        """Search shows only matching posts, the best match first."""
+        self.assertEqual(
+            self.search('кот'), [SearchTests.best, SearchTests.other]
+        )
+        self.assertEqual(self.search('пёс КОТ'), [SearchTests.other])
+
+    def test_index_follows_post_changes(self):
+        """Edited and deleted posts are found by their current text."""
+        post = Post.objects.create(text='Только лев', author=self.author)
+        post.text = 'Только жираф'
+        post.save()
+        self.assertEqual(self.search('лев'), [])
+        self.assertEqual(self.search('жираф'), [post])
+        post.delete()
+        self.assertEqual(self.search('жираф'), [])
+
+    def test_syntax_in_query_is_harmless(self):
+        """Quotes and FTS operators typed by users do not break search."""
+        self.assertEqual(match_expression('"кот" OR -'), '"кот"* "OR"*')
+        self.assertEqual(self.search('"кот'), self.search('кот'))
+        self.assertEqual(self.search('  '), [])
+
+    def test_rank_cursor_round_trip(self):
+        """Rank cursors decode to what they were built from, others fail."""
+        self.assertEqual(
+            decode_rank_cursor(encode_rank_cursor(-1.5, 7)), (-1.5, 7)
+        )
+        self.assertIsNone(decode_rank_cursor(encode_cursor(self.best)))
+        self.assertIsNone(decode_rank_cursor(pack_cursor(1.0, 2, 3)))
+        self.assertIsNone(decode_rank_cursor('broken-cursor'))
+
+    def test_cursors_walk_through_matches(self):
+        """Next and previous cursors visit every match once."""
+        Post.objects.bulk_create(
+            Post(text=f'Слон номер {i}', author=SearchTests.author)
+            for i in range(PER_PAGE + 3)
+        )
+        first = self.guest_client.get(
+            SEARCH_URL, {'q': 'слон'}
+        ).context['page']
+        self.assertEqual(len(first), PER_PAGE)
+        second = self.guest_client.get(
+            SEARCH_URL, {'q': 'слон', 'before': first.next_cursor}
+        ).context['page']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+        back = self.guest_client.get(
+            SEARCH_URL, {'q': 'слон', 'after': second.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back), list(first))
+
+    def test_backfill_command_restores_index(self):
+        """The command refills the index emptied behind its back."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+            )
+        self.assertEqual(self.search('кот'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('кот')), 2)
+
+    def test_admin_search_uses_index(self):
+        """Admin changelist finds posts through the full-text index."""
+        client = Client()
+        client.force_login(SearchTests.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пёс'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {SearchTests.other, SearchTests.dog},
+        )
@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.counters import claim_image
+from posts.models import Post, StoredImage
+
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMG = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+       b'\x01\x00\x80\x00\x00\x00\x00\x00'
+       b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+       b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+       b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+       b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch('posts.thumbnails.run_in_background', mock.Mock())
+@mock.patch('posts.thumbnails.transaction.on_commit', lambda func: func())
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='uma')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def refs(self, name):
+        return StoredImage.objects.get(name=name).refs
+
+    def create_post(self, name):
+        return Post.objects.create(
+            text='Post with shared image',
+            author=self.author,
+            image=SimpleUploadedFile(name, IMG, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Same content is stored once and counted for every post."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('meme_retry.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
+        )
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_file_is_deleted_with_its_last_post(self):
+        """The shared file outlives every post but the last one."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('meme.gif')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+
+    def test_claim_is_one_statement(self):
+        """A release can not delete the row between claim's steps."""
+        for refs in (1, 2):
+            with self.assertNumQueries(1):
+                claim_image('posts/ab/claimed.gif')
+            self.assertEqual(self.refs('posts/ab/claimed.gif'), refs)
+
+    def test_command_dedupes_existing_media(self):
+        """Old files are moved under their hash and merged."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('other.gif')
+        old_names = ('posts/old.gif', 'posts/copy.gif')
+        for post, name in zip((first, second), old_names):
+            default_storage.save(name, ContentFile(IMG))
+            Post.objects.filter(pk=post.pk).update(image=name)
+        call_command('dedupe_media', stdout=StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotIn(first.image.name, old_names)
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        self.assertEqual(self.refs(first.image.name), 2)
@@ -0,0 +1,133 @@
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.thumbnails import (POST_THUMBNAILS, build_thumbnails, namer,
+                              prefetch_thumbnails, ready_thumbnail,
+                              schedule_thumbnails)
+
+
+User = get_user_model()
+INDEX_URL = reverse('index')
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMG = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+       b'\x01\x00\x80\x00\x00\x00\x00\x00'
+       b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+       b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+       b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+       b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='quin')
+        with mock.patch('posts.thumbnails.run_in_background'):
+            cls.post = Post.objects.create(
+                text='Post with image',
+                author=cls.author,
+                image=SimpleUploadedFile(
+                    name='small.gif', content=IMG, content_type='image/gif'
+                ),
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_placeholder_is_shown_until_thumbnail_is_built(self):
+        """Feed shows a placeholder and plans the missing thumbnail."""
+        with mock.patch('posts.thumbnails.run_in_background') as background:
+            response = self.guest_client.get(INDEX_URL)
+        self.assertNotContains(response, '<img')
+        background.assert_called_once_with(
+            'thumbnails', build_thumbnails, ThumbnailTests.post.pk
+        )
+
+    # sorl-thumbnail 12.6 resizes with Image.ANTIALIAS removed in Pillow 10
+    @skipUnless(hasattr(Image, 'ANTIALIAS'), 'needs Pillow < 10')
+    def test_built_thumbnail_replaces_placeholder(self):
+        """Built thumbnail outdates cached feeds and is shown in them."""
+        post = ThumbnailTests.post
+        with mock.patch('posts.thumbnails.run_in_background'):
+            self.guest_client.get(INDEX_URL)
+        build_thumbnails(post.pk)
+        thumbnail = ready_thumbnail(post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, thumbnail.url)
+
+    def test_thumbnails_are_planned_once(self):
+        """Repeated requests for the same post start a single job."""
+        with mock.patch('posts.thumbnails.run_in_background') as background:
+            schedule_thumbnails(ThumbnailTests.post.pk)
+            schedule_thumbnails(ThumbnailTests.post.pk)
+        self.assertEqual(background.call_count, 1)
+
+
+class ThumbnailPrefetchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='rex')
+        with mock.patch('posts.thumbnails.run_in_background'):
+            cls.posts = [
+                Post.objects.create(
+                    text=f'Prefetched post {i}',
+                    author=cls.author,
+                    image=f'posts/prefetched_{i}.gif',
+                )
+                for i in range(3)
+            ]
+        geometry, options = POST_THUMBNAILS['card']
+        for post in cls.posts[:2]:
+            thumbnail = namer.thumbnail_file(post.image, geometry, **options)
+            thumbnail.set_size((960, 339))
+            default.kvstore.set(thumbnail)
+
+    def setUp(self):
+        cache.clear()
+
+    def kvstore_queries(self, posts):
+        with CaptureQueriesContext(connection) as queries:
+            prefetch_thumbnails(posts, ['card'])
+        return [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+
+    def test_page_is_resolved_by_one_lookup(self):
+        """Thumbnails of a page take one query and none once cached."""
+        posts = list(Post.objects.filter(author=self.author).order_by('pk'))
+        with mock.patch('posts.thumbnails.run_in_background') as background:
+            self.assertEqual(len(self.kvstore_queries(posts)), 1)
+            self.assertEqual(self.kvstore_queries(posts), [])
+        for post, expected in zip(posts, ThumbnailPrefetchTests.posts[:2]):
+            with self.subTest(post=post):
+                self.assertEqual(
+                    post.thumbnails['card'].url,
+                    ready_thumbnail(expected.image, 'card').url,
+                )
+        self.assertIsNone(posts[2].thumbnails['card'])
+        background.assert_called_once_with(
+            'thumbnails', build_thumbnails, posts[2].pk
+        )
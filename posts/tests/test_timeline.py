@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.fragments import get_versions, version_key
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import deliver_author, deliver_post
+
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='ivy')
+        cls.reader = User.objects.create(username='joe')
+        cls.old_post = Post.objects.create(text='Old post', author=cls.author)
+
+    def timeline_posts(self):
+        return set(TimelineEntry.objects.filter(
+            user=TimelineTests.reader
+        ).values_list('post_id', flat=True))
+
+    def test_follow_and_new_post_fill_timeline(self):
+        """Following delivers old posts and new posts are fanned out."""
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        new_post = Post.objects.create(
+            text='New post', author=TimelineTests.author
+        )
+        self.assertEqual(
+            self.timeline_posts(), {TimelineTests.old_post.pk, new_post.pk}
+        )
+        new_post.delete()
+        self.assertEqual(self.timeline_posts(), {TimelineTests.old_post.pk})
+
+    def test_unfollow_clears_timeline(self):
+        """Unfollowing removes posts of the author from the timeline."""
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        Follow.objects.filter(user=TimelineTests.reader).delete()
+        self.assertEqual(self.timeline_posts(), set())
+
+    def test_popular_author_is_fanned_out_in_background(self):
+        """Posts of authors with many followers leave the request."""
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+        with mock.patch('posts.timeline.SYNC_LIMIT', 0), \
+                mock.patch('posts.timeline.run_in_background') as background:
+            Post.objects.create(
+                text='Popular post', author=TimelineTests.author
+            )
+        self.assertEqual(background.call_count, 1)
+        self.assertEqual(self.timeline_posts(), {TimelineTests.old_post.pk})
+
+    def test_popular_author_post_costs_the_same(self):
+        """Saving a post does no work per follower of a popular author."""
+        def create_post_queries():
+            # follows saved in bulk are not counted, so the limit is below 0
+            with mock.patch('posts.timeline.SYNC_LIMIT', -1), \
+                    mock.patch('posts.timeline.run_in_background'), \
+                    CaptureQueriesContext(connection) as queries:
+                Post.objects.create(
+                    text='Popular post', author=TimelineTests.author
+                )
+            return len(queries)
+
+        def add_followers(names):
+            Follow.objects.bulk_create(
+                Follow(user=User.objects.create(username=name),
+                       author=TimelineTests.author)
+                for name in names
+            )
+
+        add_followers(f'few{i}' for i in range(2))
+        few = create_post_queries()
+        add_followers(f'many{i}' for i in range(30))
+        self.assertEqual(create_post_queries(), few)
+
+    def test_delivery_outdates_follow_feed(self):
+        """Follow pages rendered before a background delivery are rebuilt."""
+        key = version_key('follow', TimelineTests.reader.pk)
+        with mock.patch('posts.timeline.SYNC_LIMIT', 0), \
+                mock.patch('posts.timeline.run_in_background'):
+            Follow.objects.create(
+                user=TimelineTests.reader, author=TimelineTests.author
+            )
+            post = Post.objects.create(
+                text='Popular post', author=TimelineTests.author
+            )
+        versions = get_versions([key])
+        deliver_post(post.pk, post.author_id, post.pub_date)
+        self.assertNotEqual(get_versions([key]), versions)
+        versions = get_versions([key])
+        deliver_author(TimelineTests.reader.pk, TimelineTests.author.pk)
+        self.assertNotEqual(get_versions([key]), versions)
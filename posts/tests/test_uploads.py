@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.models import Post
+
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
+
+def photo(size, orientation=1):
+    exif = Image.Exif()
+    exif[MAKE] = 'Test camera'
+    exif[ORIENTATION] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile('photo.jpeg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='tom')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def form(self, image):
+        return PostForm(data={'text': 'Post with photo'}, files={
+            'image': image,
+        })
+
+    def test_new_post_keeps_attached_image(self):
+        """Image sent with a new post is saved with it."""
+        client = Client()
+        client.force_login(UploadTests.author)
+        with mock.patch('posts.thumbnails.run_in_background'):
+            client.post(reverse('new_post'), {
+                'text': 'New post with photo', 'image': photo((40, 30)),
+            })
+        post = Post.objects.get(text='New post with photo')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+
+    def test_large_photo_is_downscaled_without_exif(self):
+        """Photo is turned upright, shrunk and loses its metadata."""
+        form = self.form(photo((3000, 1500), orientation=6))
+        with mock.patch('posts.uploads.MAX_SIDE', 1000):
+            self.assertTrue(form.is_valid(), form.errors)
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual(image.size, (500, 1000))
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_too_many_pixels_are_rejected_by_header(self):
+        """Images larger than the pixel limit are not accepted."""
+        form = self.form(photo((300, 200)))
+        with mock.patch('posts.uploads.MAX_PIXELS', 300 * 200 - 1):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'image_too_large')
@@ -5,7 +5,9 @@ from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 
 from posts.models import Group, Post, Comment
 
@@ -174,13 +176,27 @@ class PostsURLTests(TestCase):
                 self.assertRedirects(response, redirect_url)
 
     def test_index_cache(self):
+        """Index posts are cached until a post changes."""
+        cache.clear()
         response_first = self.guest_client.get(INDEX_URL)
+        with CaptureQueriesContext(connection) as queries:
+            response_second = self.guest_client.get(INDEX_URL)
+        self.assertEqual(response_first.content, response_second.content)
+        posts_queries = [
+            query for query in queries if 'posts_' in query['sql']
+        ]
+        self.assertEqual(posts_queries, [])
         Post.objects.create(
             text="Cache testing post",
             author=PostsURLTests.user_bob,
         )
-        response_second = self.guest_client.get(INDEX_URL)
-        self.assertEqual(response_first.content, response_second.content)
-        cache.clear()
         response_third = self.guest_client.get(INDEX_URL)
         self.assertNotEqual(response_first.content, response_third.content)
+        self.assertContains(response_third, "Cache testing post")
+
+    def test_index_cache_varies_on_page(self):
+        """Cached first page is not served for the second one."""
+        cache.clear()
+        response_first = self.guest_client.get(INDEX_URL)
+        response_second = self.guest_client.get(INDEX_URL, {'page': 2})
+        self.assertNotEqual(response_first.content, response_second.content)
@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post
+from posts.thumbnails import save_variants
+from posts.variants import FORMATS, variant_name
+
+
+User = get_user_model()
+INDEX_URL = reverse('index')
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name, size):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 255)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='sam')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        with mock.patch('posts.thumbnails.run_in_background'):
+            self.post = Post.objects.create(
+                text='Post with variants',
+                author=ImageVariantsTests.author,
+                image=upload('wide.png', (1000, 500)),
+            )
+
+    def test_variants_of_every_width_and_format(self):
+        """Variants no wider than the original are stored beside it."""
+        save_variants(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_widths, '480,960')
+        self.assertIn('webp', FORMATS)
+        for width in (480, 960):
+            for fmt in FORMATS:
+                name = variant_name(self.post.image.name, width, fmt)
+                with self.subTest(name=name):
+                    with default_storage.open(name) as file:
+                        self.assertEqual(
+                            Image.open(file).size,
+                            (width, round(width * 339 / 960)),
+                        )
+
+    def test_card_offers_srcset(self):
+        """Post card lists variants lazily loaded by the browser."""
+        save_variants(self.post)
+        response = Client().get(INDEX_URL)
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, '480w')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_new_image_outdates_variants(self):
+        """Replacing the image drops widths of the old variants."""
+        save_variants(self.post)
+        cache.clear()
+        self.post.image = upload('other.png', (600, 300))
+        with mock.patch('posts.thumbnails.run_in_background') as background:
+            self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_widths, '')
+        self.assertEqual(background.call_count, 1)
+
+    def test_command_backfills_variants(self):
+        """The command builds variants of posts lacking them."""
+        call_command('build_image_variants', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_widths, '480,960')
+
+    def test_command_rebuilds_every_variant(self):
+        """With --all variants are built again, even of finished posts."""
+        save_variants(self.post)
+        with mock.patch(
+            'posts.thumbnails.build_variants', return_value=[480]
+        ) as build:
+            call_command('build_image_variants', '--all', stdout=StringIO())
+        self.assertEqual(build.call_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_widths, '480')
@@ -2,9 +2,12 @@ import shutil
 import tempfile
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
@@ -103,10 +106,7 @@ class PostsViewsTests(TestCase):
         self.client_bob.force_login(user_bob)
         self.client_john.force_login(user_john)
         self.client_alf.force_login(user_alf)
-        self.follow = Follow.objects.create(
-            user=user_john,
-            author=user_bob,
-        )
+        self.follow = PostsViewsTests.follow
         self.comment = Comment.objects.create(
             author=user_john,
             post=PostsViewsTests.post,
@@ -297,3 +297,59 @@ class PostsViewsTests(TestCase):
         user = PostsViewsTests.user_bob
         exist_answer = Follow.objects.filter(user=user, author=author).exists()
         self.assertEqual(exist_answer, False)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='kim')
+        cls.reader = User.objects.create(username='lee')
+        cls.group = Group.objects.create(
+            title='Queries group',
+            description='About queries group',
+            slug='queries',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.feed_urls = (
+            INDEX_URL,
+            FOLLOW_URL,
+            reverse('group', args=[cls.group.slug]),
+            reverse('profile', args=[cls.author.username]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client_reader = Client()
+        self.client_reader.force_login(FeedQueriesTests.reader)
+
+    def add_commented_posts(self, amount):
+        for i in range(amount):
+            post = Post.objects.create(
+                text=f'Queries post {i}',
+                author=FeedQueriesTests.author,
+                group=FeedQueriesTests.group,
+            )
+            Comment.objects.create(
+                text=f'Queries comment {i}',
+                author=FeedQueriesTests.reader,
+                post=post,
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client_reader.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_posts_amount(self):
+        """Feed pages with comments make as many queries for one post
+        as for a full page of posts.
+        """
+        self.add_commented_posts(1)
+        single = {url: self.count_queries(url)
+                  for url in FeedQueriesTests.feed_urls}
+        self.add_commented_posts(PER_PAGE)
+        for url in FeedQueriesTests.feed_urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
@@ -0,0 +1,198 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .background import run_in_background
+from .counters import release_image
+from .fragments import bump_versions, post_version_keys
+from .models import Post
+from .uploads import describe_image
+from .variants import build_variants, delete_variants
+
+
+JOB_TIMEOUT = settings.THUMBNAIL_JOB_TIMEOUT
+KVSTORE_TIMEOUT = thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+# every thumbnail of Post.image used by templates, by name
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Post fields filled by describe_image, in its order
+IMAGE_INFO_FIELDS = ('image_width', 'image_height', 'image_placeholder')
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailNamer(ThumbnailBackend):
+    """sorl backend which names a thumbnail without building it."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+namer = ThumbnailNamer()
+
+
+def ready_thumbnail(image, name):
+    """Return the built thumbnail of image or None without building it."""
+    geometry, options = POST_THUMBNAILS[name]
+    return default.kvstore.get(
+        namer.thumbnail_file(image, geometry, **options)
+    )
+
+
+def fetch_kvstore_values(keys):
+    """Read raw values of the cached db key-value store in bulk.
+
+    Does what sorl does for a single key: one get_many from its cache
+    and one query for the rest, remembering missing keys as empty.
+    """
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(keys)
+    missed = [key for key in keys if key not in values]
+    if missed:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missed
+        ).values_list('key', 'value'))
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missed}
+        kv_cache.set_many(fetched, KVSTORE_TIMEOUT)
+        values.update(fetched)
+    return {
+        key: value for key, value in values.items()
+        if value and value != EMPTY_VALUE
+    }
+
+
+def prefetch_thumbnails(posts, names):
+    """Find built thumbnails of a page of posts at once.
+
+    Stores them in `post.thumbnails` by name, None standing for a missing
+    one, whose building is planned. Posts having responsive variants do
+    not need thumbnails and are skipped.
+    """
+    posts = [
+        post for post in posts if post.image and not post.image_widths
+    ]
+    if isinstance(default.kvstore, cached_db_kvstore.KVStore):
+        keys = {}
+        for post in posts:
+            for name in names:
+                geometry, options = POST_THUMBNAILS[name]
+                thumbnail = namer.thumbnail_file(
+                    post.image, geometry, **options
+                )
+                keys[post.pk, name] = add_prefix(thumbnail.key)
+        values = fetch_kvstore_values(list(set(keys.values())))
+        for post in posts:
+            post.thumbnails = {}
+            for name in names:
+                value = values.get(keys[post.pk, name])
+                post.thumbnails[name] = (
+                    None if value is None else deserialize_image_file(value)
+                )
+    else:
+        for post in posts:
+            post.thumbnails = {
+                name: ready_thumbnail(post.image, name) for name in names
+            }
+    for post in posts:
+        if None in post.thumbnails.values():
+            schedule_thumbnails(post.pk)
+
+
+def job_key(post_id):
+    return f'thumbnail_job:{post_id}'
+
+
+def schedule_thumbnails(post_id):
+    """Build thumbnails of the post in background unless it is planned."""
+    if cache.add(job_key(post_id), 1, JOB_TIMEOUT):
+        run_in_background('thumbnails', build_thumbnails, post_id)
+
+
+def save_variants(post, force=False):
+    """Build responsive variants of the post image and remember them.
+
+    Posts sharing the image file reuse variants built for another one,
+    unless force asks to build them again. Size and placeholder of an
+    image saved without them, e.g. by bulk_create, are filled in too.
+    """
+    fields = {}
+    if post.image_width is None:
+        fields.update(zip(IMAGE_INFO_FIELDS, describe_image(post.image)))
+    widths = None
+    if not force:
+        others = Post.objects.filter(image=post.image.name).exclude(
+            pk=post.pk
+        )
+        widths = others.exclude(image_widths='').values_list(
+            'image_widths', flat=True
+        ).first()
+    if widths is None:
+        widths = ','.join(map(str, build_variants(post.image)))
+    fields['image_widths'] = widths
+    Post.objects.filter(pk=post.pk, image=post.image.name).update(**fields)
+    for field, value in fields.items():
+        setattr(post, field, value)
+
+
+def build_thumbnails(post_id):
+    """Build image variants and thumbnails of the post, refresh its feeds.
+
+    A failed job keeps its mark until JOB_TIMEOUT, so a broken image is
+    not decoded again by every request rendering it.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    try:
+        save_variants(post)
+        for geometry, options in POST_THUMBNAILS.values():
+            get_thumbnail(post.image, geometry, **options)
+    except Exception:
+        logger.exception('Images of post %s are not built', post_id)
+    else:
+        cache.delete(job_key(post_id))
+    finally:
+        bump_versions(post_version_keys(post))
+
+
+def delete_image_files(name):
+    """Delete the image file with its variants and thumbnails.
+
+    Failures are only logged, a file left behind does less harm than
+    a failed request deleting the post.
+    """
+    try:
+        delete_variants(name)
+        delete(name)
+    except (OSError, SuspiciousFileOperation):
+        logger.exception('Files of image %s are not deleted', name)
+
+
+def forget_image(name):
+    """Release the post's image, deleting files nobody uses any more."""
+    if release_image(name):
+        transaction.on_commit(lambda: delete_image_files(name))
@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .background import run_in_background
+from .fragments import bump_versions, version_key
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import feed_key
+
+
+BATCH_SIZE = settings.TIMELINE_FANOUT_BATCH_SIZE
+SYNC_LIMIT = settings.TIMELINE_FANOUT_SYNC_LIMIT
+
+
+def insert_entries(entries):
+    """Save entries in batches skipping ones already delivered."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def follower_batches(author_id):
+    """Yield ids of followers of the author in lists of BATCH_SIZE."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).order_by()
+    batch = []
+    for user_id in followers.iterator(chunk_size=BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def forget_follow_counts(user_ids):
+    """Drop cached amounts of follow feeds, they are counted once more."""
+    cache.delete_many([feed_key('follow', user_id) for user_id in user_ids])
+
+
+def outdate_follow_feeds(user_ids):
+    """Outdate follow feed fragments rendered before the delivery."""
+    bump_versions([version_key('follow', user_id) for user_id in user_ids])
+
+
+def deliver_post(post_id, author_id, pub_date):
+    """Put the post into timelines of every follower of its author."""
+    for user_ids in follower_batches(author_id):
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in user_ids
+        ], ignore_conflicts=True)
+        forget_follow_counts(user_ids)
+        outdate_follow_feeds(user_ids)
+
+
+def insert_selected(column, queryset):
+    """Put posts into timelines of followers by one INSERT ... SELECT.
+
+    Joins posts with follows of their authors, keeping rows whose column,
+    `post.id` or `follow.id`, is among pks of the queryset.
+    """
+    ops = connection.ops
+    select, params = queryset.values('pk').query.sql_with_params()
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{ops.quote_name(TimelineEntry._meta.db_table)} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.pub_date '
+        f'FROM {ops.quote_name(Post._meta.db_table)} post '
+        f'JOIN {ops.quote_name(Follow._meta.db_table)} follow '
+        f'ON follow.author_id = post.author_id '
+        f'WHERE {column} IN ({select}) '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def deliver_posts(posts):
+    """Put posts of the queryset into timelines of followers at once.
+
+    For imports saving thousands of posts in bulk.
+    """
+    insert_selected('post.id', posts)
+
+
+def deliver_follows(follows):
+    """Put posts of followed authors into timelines of follows at once.
+
+    Like deliver_posts, for follows saved in bulk.
+    """
+    insert_selected('follow.id', follows)
+
+
+def forget_post(author_id):
+    """Outdate follow feed amounts of followers of a deleted post."""
+    for user_ids in follower_batches(author_id):
+        forget_follow_counts(user_ids)
+
+
+def deliver_author(user_id, author_id):
+    """Put every post of the author into the user's timeline."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date').order_by()
+    insert_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator(chunk_size=BATCH_SIZE)
+    )
+    outdate_follow_feeds([user_id])
+
+
+def stored_count(user_id, counter):
+    return UserStats.objects.filter(
+        user_id=user_id
+    ).values_list(counter, flat=True).first() or 0
+
+
+def fan_out_post(post):
+    """Deliver a new post, in background when its author is popular."""
+    args = (post.pk, post.author_id, post.pub_date)
+    if stored_count(post.author_id, 'followers_count') > SYNC_LIMIT:
+        run_in_background('timeline', deliver_post, *args)
+    else:
+        deliver_post(*args)
+
+
+def fan_out_deletion(post):
+    """Outdate follow feeds of a deleted post like fan_out_post does."""
+    if stored_count(post.author_id, 'followers_count') > SYNC_LIMIT:
+        run_in_background('timeline', forget_post, post.author_id)
+    else:
+        forget_post(post.author_id)
+
+
+def fan_in_author(user_id, author_id):
+    """Deliver posts of a just followed author to the follower."""
+    if stored_count(author_id, 'posts_count') > SYNC_LIMIT:
+        run_in_background('timeline', deliver_author, user_id, author_id)
+    else:
+        deliver_author(user_id, author_id)
+
+
+def drop_author(user_id, author_id):
+    """Remove posts of an unfollowed author from the user's timeline."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
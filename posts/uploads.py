@@ -0,0 +1,131 @@
+import base64
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageFilter, ImageOps
+
+from .background import get_executor
+
+
+MAX_UPLOAD_SIZE = settings.POST_IMAGE_MAX_UPLOAD_SIZE
+MAX_PIXELS = settings.POST_IMAGE_MAX_PIXELS
+MAX_SIDE = settings.POST_IMAGE_MAX_SIDE
+QUALITY = settings.POST_IMAGE_QUALITY
+SPOOL_SIZE = settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+PLACEHOLDER_WIDTH = settings.POST_IMAGE_PLACEHOLDER_WIDTH
+# EXIF orientations which swap width and height
+ORIENTATION = 0x0112
+ROTATED = {5, 6, 7, 8}
+INVALID_IMAGE = 'Загрузите правильное изображение.'
+
+
+def check_upload(file):
+    """Reject too large uploads reading only the image header."""
+    if file.size > MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': MAX_UPLOAD_SIZE // 2 ** 20},
+        )
+    file.seek(0)
+    try:
+        width, height = Image.open(file).size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    if width * height > MAX_PIXELS:
+        raise ValidationError(
+            'Изображение больше %(limit)s мегапикселей.',
+            code='image_too_large',
+            params={'limit': MAX_PIXELS // 10 ** 6},
+        )
+
+
+def normalize(file):
+    """Downscale image to MAX_SIDE and re-encode it without metadata.
+
+    JPEG is decoded right at a reduced scale by draft mode, so a large
+    photo never takes its full size in memory. The result is spooled to
+    disk when large. Animated images are returned as None and kept.
+    """
+    file.seek(0)
+    image = Image.open(file)
+    if getattr(image, 'is_animated', False):
+        return None
+    image.draft('RGB', (MAX_SIDE, MAX_SIDE))
+    icc_profile = image.info.get('icc_profile')
+    has_alpha = 'A' in image.mode or 'transparency' in image.info
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    root, _ = os.path.splitext(os.path.basename(file.name))
+    if has_alpha:
+        image.convert('RGBA').save(
+            output, 'PNG', optimize=True, icc_profile=icc_profile
+        )
+        name = f'{root}.png'
+    else:
+        image.convert('RGB').save(
+            output, 'JPEG', quality=QUALITY, optimize=True,
+            progressive=True, icc_profile=icc_profile,
+        )
+        name = f'{root}.jpg'
+    output.seek(0)
+    return File(output, name=name)
+
+
+def process_upload(file):
+    """Validate an uploaded image and return its normalized copy.
+
+    Decoding runs in the bounded `uploads` pool, so only a few images
+    are held in memory at once whatever the amount of requests.
+    """
+    check_upload(file)
+    try:
+        normalized = get_executor('uploads').submit(normalize, file).result()
+    except OSError:
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    return normalized or file
+
+
+def placeholder(image):
+    """Return a blurred PLACEHOLDER_WIDTH pixels wide copy as data URI."""
+    height = max(round(image.height * PLACEHOLDER_WIDTH / image.width), 1)
+    tiny = image.convert('RGB').resize((PLACEHOLDER_WIDTH, height))
+    buffer = BytesIO()
+    tiny.filter(ImageFilter.GaussianBlur(1)).save(
+        buffer, 'JPEG', quality=50
+    )
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def describe(file):
+    """Return width, height and blurred placeholder of an image file.
+
+    The size is read from the header, the placeholder is decoded at a
+    reduced scale by draft mode, so even a large photo is cheap.
+    """
+    file.seek(0)
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(ORIENTATION) in ROTATED:
+        width, height = height, width
+    image.draft('RGB', (PLACEHOLDER_WIDTH * 4, PLACEHOLDER_WIDTH * 4))
+    image = ImageOps.exif_transpose(image)
+    file.seek(0)
+    return width, height, placeholder(image)
+
+
+def describe_image(image):
+    """Describe the image of an ImageField, saved or just uploaded.
+
+    Runs in the `uploads` pool like the other decoding of images.
+    """
+    if image._committed:
+        with image.open('rb') as file:
+            return get_executor('uploads').submit(describe, file).result()
+    return get_executor('uploads').submit(describe, image.file).result()
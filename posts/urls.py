@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -8,6 +8,28 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('', views.index, name='index'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path('api/v1/posts/new/', api.index_new_posts, name='api_index_new'),
+    path('api/v1/stats/', api.stats, name='api_stats'),
+    path('api/v1/follow/', api.follow_index, name='api_follow_index'),
+    path(
+        'api/v1/follow/new/',
+        api.follow_new_posts,
+        name='api_follow_index_new',
+    ),
+    path('api/v1/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path(
+        'api/v1/group/<slug:slug>/new/',
+        api.group_new_posts,
+        name='api_group_new',
+    ),
+    path('api/v1/users/<str:username>/', api.profile, name='api_profile'),
+    path(
+        'api/v1/users/<str:username>/<int:post_id>/',
+        api.post_view,
+        name='api_post',
+    ),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
@@ -15,6 +37,11 @@ urlpatterns = [
         views.post_edit,
         name='post_edit',
     ),
+    path(
+        '<str:username>/<int:post_id>/comments/live/',
+        views.comment_stream,
+        name='comment_stream',
+    ),
     path(
         '<username>/<int:post_id>/comment/',
         views.add_comment,
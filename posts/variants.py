@@ -0,0 +1,99 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+WIDTHS = sorted(settings.POST_IMAGE_WIDTHS)
+QUALITY = settings.POST_IMAGE_QUALITY
+# variants are cropped like the 960x339 card thumbnail
+CARD_RATIO = 339 / 960
+SIZES = '(min-width: 1200px) 1110px, 100vw'
+EXTENSIONS = {'jpeg': 'jpg'}
+
+Image.init()
+FORMATS = [
+    fmt for fmt in settings.POST_IMAGE_FORMATS if fmt.upper() in Image.SAVE
+]
+
+
+def variant_name(name, width, fmt):
+    """Return name of a variant stored next to the original image."""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{EXTENSIONS.get(fmt, fmt)}'
+
+
+def parse_widths(widths):
+    return [int(width) for width in widths.split(',') if width]
+
+
+def encode(image, fmt):
+    has_alpha = 'A' in image.mode or 'transparency' in image.info
+    mode = 'RGBA' if has_alpha and fmt != 'jpeg' else 'RGB'
+    buffer = BytesIO()
+    image.convert(mode).save(buffer, fmt.upper(), quality=QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(image):
+    """Store card crops of image in every width and format.
+
+    Variants are saved by their own names into the default storage, which
+    keeps them next to content-addressed originals.
+
+    Widths larger than the original are skipped, the smallest one is
+    always built. Returns the built widths.
+    """
+    with image.open('rb') as file:
+        source = Image.open(file)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    widths = [width for width in WIDTHS if width <= source.width]
+    widths = widths or WIDTHS[:1]
+    for width in widths:
+        size = (width, round(width * CARD_RATIO))
+        resized = ImageOps.fit(source, size, Image.LANCZOS)
+        for fmt in FORMATS:
+            name = variant_name(image.name, width, fmt)
+            default_storage.delete(name)
+            default_storage.save(name, encode(resized, fmt))
+    return widths
+
+
+def delete_variants(name):
+    for width in WIDTHS:
+        for fmt in FORMATS:
+            default_storage.delete(variant_name(name, width, fmt))
+
+
+def picture(post):
+    """Return context of <picture> showing variants of the post image.
+
+    Every format but the last one becomes a <source>, the last one is
+    used by <img> itself.
+    """
+    widths = parse_widths(post.image_widths)
+    name = post.image.name
+    url = default_storage.url
+    srcsets = [
+        ', '.join(
+            f'{url(variant_name(name, width, fmt))} {width}w'
+            for width in widths
+        )
+        for fmt in FORMATS
+    ]
+    largest = widths[-1]
+    return {
+        'sources': [
+            (f'image/{fmt}', srcset)
+            for fmt, srcset in zip(FORMATS[:-1], srcsets)
+        ],
+        'src': url(variant_name(name, largest, FORMATS[-1])),
+        'srcset': srcsets[-1],
+        'sizes': SIZES,
+        'width': largest,
+        'height': round(largest * CARD_RATIO),
+    }
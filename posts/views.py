@@ -1,54 +1,82 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
 
+from .counters import get_author_sidebar
+from .decorators import cache_anonymous_page, cached_pk
+from .feeds import (author_feed, follow_feed, group_feed, index_feed,
+                    post_comments)
 from .forms import CommentForm, PostForm
-from .models import Group, Post, User, Follow, Comment
+from .fragments import feed_fragment, version_key
+from .live import CHECK_INTERVAL, get_watermark, subscribe
+from .models import Group, Post, User, Follow
+from .search import search_posts
 
 
 PER_PAGE = settings.PER_PAGE
 
 
+def group_versions(slug):
+    pk = cached_pk(Group, 'slug', slug)
+    return None if pk is None else [version_key('group', pk)]
+
+
+def author_versions(username, **kwargs):
+    pk = cached_pk(User, 'username', username)
+    return None if pk is None else [version_key('author', pk)]
+
+
+@cache_anonymous_page(lambda: [version_key('index')])
 def index(request):
     """Return defined in PER_PAGE amount of posts per page beginning
     from last.
     """
-    posts_list = Post.objects.select_related('author', 'group').all()
-    paginator = Paginator(posts_list, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = index_feed()
+    page = paginator.page_for_request(request)
     context = {
         "page": page,
         "paginator": paginator,
+        **feed_fragment(request, 'index', [version_key('index')]),
     }
     return render(request, "index.html", context)
 
 
+@cache_anonymous_page(group_versions)
 def group_posts(request, slug):
     """Return defined in PER_PAGE amount of posts per page
     in group beginning from last.
     """
     group = get_object_or_404(Group, slug=slug)
-    group_posts = Post.objects.select_related(
-                        'author', 'group'
-                    ).filter(
-                        group=group
-                    )
-    paginator = Paginator(group_posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = group_feed(group)
+    page = paginator.page_for_request(request)
     context = {
         "group": group,
         "page": page,
         "paginator": paginator,
+        **feed_fragment(
+            request, f'group:{group.pk}', [version_key('group', group.pk)]
+        ),
     }
     return render(request, "group.html", context)
 
 
+def search(request):
+    """Return posts matching `q` GET param, the best matches first."""
+    query = request.GET.get('q', '').strip()
+    paginator = search_posts(query, PER_PAGE)
+    page = paginator.page_for_request(request)
+    context = {
+        "query": query,
+        "page": page,
+        "paginator": paginator,
+    }
+    return render(request, "search.html", context)
+
+
 @login_required
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST' and form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -58,54 +86,43 @@ def new_post(request):
     return render(request, 'posts/new.html', context)
 
 
+@cache_anonymous_page(author_versions)
 def profile(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    author_posts = Post.objects.select_related(
-                        'author', 'group'
-                    ).filter(
-                        author=author
-                    )
-    posts_count = author.posts.count()
-    paginator = Paginator(author_posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    followers_count = author.following.count()
-    followings_count = author.follower.count()
-    is_following = (request.user.is_authenticated and
-                    Follow.objects.filter(author=author, user=user).exists())
+    paginator = author_feed(author)
+    page = paginator.page_for_request(request)
     context = {
         "page": page,
         "author": author,
         "paginator": paginator,
-        "posts_count": posts_count,
-        "followers_count": followers_count,
-        "followings_count": followings_count,
-        "is_following": is_following,
+        **get_author_sidebar(author, request.user),
+        **feed_fragment(
+            request, f'author:{author.pk}',
+            [version_key('author', author.pk)],
+        ),
     }
     return render(request, 'profile.html', context)
 
 
+@cache_anonymous_page(author_versions)
 def post_view(request, username, post_id):
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author=author, id=post_id)
-    comments_list = Comment.objects.select_related(
-                            'author', 'post'
-                        ).filter(
-                            post=post
-                        )
-    posts_count = author.posts.count()
-    followers_count = author.following.count()
-    followings_count = author.follower.count()
+    post = get_object_or_404(
+        Post.objects.for_feed(), author=author, id=post_id
+    )
+    comments_list = post_comments(post)
+    # len() fills the result cache, so the page reuses the same query
+    comments_count = len(comments_list)
     form = CommentForm(request.POST or None)
     context = {
         "post": post,
-        "posts_count": posts_count,
-        "followers_count": followers_count,
-        "followings_count": followings_count,
         "author": author,
         "comments_list": comments_list,
+        "last_comment_id": (
+            comments_list[comments_count - 1].pk if comments_count else 0
+        ),
         "form": form,
+        **get_author_sidebar(author, request.user),
     }
     return render(request, 'post.html', context)
 
@@ -131,6 +148,31 @@ def post_edit(request, username, post_id):
     return render(request, 'posts/new.html', context)
 
 
+def comment_stream(request, username, post_id):
+    """Stream comments added to the post as Server-Sent Events.
+
+    Starts after the id in `Last-Event-ID` header sent by reconnecting
+    browsers or `after` GET param, otherwise after the last comment.
+    """
+    post = get_object_or_404(
+        Post.objects.only('pk'), author__username=username, id=post_id
+    )
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    try:
+        after = int(after)
+    except (TypeError, ValueError):
+        after = get_watermark(post.pk)
+    stream = subscribe(post.pk, after)
+    if stream is None:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = CHECK_INTERVAL * 10
+        return response
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
@@ -146,17 +188,17 @@ def add_comment(request, username, post_id):
 @login_required
 def follow_index(request):
     user = request.user
-    posts_list = Post.objects.select_related(
-                        'author', 'group'
-                    ).filter(
-                        author__following__user=user
-                    )
-    paginator = Paginator(posts_list, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = follow_feed(user)
+    page = paginator.page_for_request(request)
+    authors = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    versions = [version_key('follow', user.pk)]
+    versions.extend(version_key('author', pk) for pk in authors)
     context = {
         "page": page,
         "paginator": paginator,
+        **feed_fragment(request, f'follow:{user.pk}', versions),
     }
     return render(request, "follow.html", context)
 
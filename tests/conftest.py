@@ -1,4 +1,12 @@
+import pytest
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def eager_background_jobs(settings):
+    settings.BACKGROUND_EAGER = True
@@ -1,11 +1,20 @@
+from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 
 
 User = get_user_model()
+# first parts of site addresses, profiles of users named so are unreachable
+RESERVED_USERNAMES = frozenset({'new', 'follow', 'group', 'search'})
 
 
 class CreationForm(UserCreationForm):
     class Meta:
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username in RESERVED_USERNAMES:
+            raise forms.ValidationError('Это имя занято адресом на сайте.')
+        return username
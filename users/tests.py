@@ -1,3 +1,21 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+
+User = get_user_model()
+SIGNUP_URL = reverse('signup')
+
+
+class SignUpTests(TestCase):
+    def test_names_of_site_pages_are_reserved(self):
+        """Nobody signs up as `search`, the profile would be unreachable."""
+        response = self.client.post(SIGNUP_URL, {
+            'username': 'search',
+            'password1': 'Uncommon-pass-42',
+            'password2': 'Uncommon-pass-42',
+        })
+        self.assertFormError(
+            response, 'form', 'username', 'Это имя занято адресом на сайте.'
+        )
+        self.assertFalse(User.objects.filter(username='search').exists())
@@ -0,0 +1,313 @@
+"""Two-tier cache backend.
+
+Every process keeps a small LRU of recently used values (L1) in front of
+a cache shared by all workers (L2), e.g. the database cache. Keys belong
+to namespaces named by their part before the first `:`, `.` or `|`, like
+`feed_version` or `template`. Writes go through both tiers and replace
+the stamp of their namespace kept in L2. Other processes compare stamps
+of the namespaces they hold at most every CHECK_INTERVAL seconds and drop
+L1 values of the changed ones only, so L1 values are never older than
+that interval and L1_TIMEOUT.
+
+Namespaces listed in IMMUTABLE hold values which never change under the
+same key, e.g. keyed by a digest of their versions, and are written
+without a stamp. Namespaces listed in L2_ONLY, like locks, skip L1.
+"""
+import pickle
+import re
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+STAMP_PREFIX = 'two_tier:stamp:'
+INCR_LOCK_PREFIX = 'two_tier:incr_lock:'
+# seconds an incr holds its lock at most, a crashed holder loses it then
+INCR_LOCK_TIMEOUT = 5
+NAMESPACE_END = re.compile(r'[:.|]')
+MISSING = object()
+
+# per-process stores keyed by cache name, shared by every thread
+_stores = {}
+_stores_lock = Lock()
+
+
+def namespace_of(key):
+    return NAMESPACE_END.split(key, 1)[0]
+
+
+def stamp_key(namespace):
+    return f'{STAMP_PREFIX}{namespace}'
+
+
+class LocalStore:
+    """Bounded LRU of pickled values with expiry times.
+
+    Remembers the stamp of every namespace it holds values of.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.values = OrderedDict()
+        self.stamps = {}
+        self.lock = Lock()
+        self.checked = 0
+        self.stats = {
+            'l1_hits': 0,
+            'l1_misses': 0,
+            'l2_hits': 0,
+            'l2_misses': 0,
+            'l1_flushes': 0,
+        }
+
+    def get(self, key):
+        with self.lock:
+            item = self.values.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self.values.move_to_end(key)
+                self.stats['l1_hits'] += 1
+                return pickle.loads(item[0])
+            if item is not None:
+                del self.values[key]
+            self.stats['l1_misses'] += 1
+        return MISSING
+
+    def set(self, key, value, expires, namespace):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.values[key] = (pickled, expires, namespace)
+            self.values.move_to_end(key)
+            while len(self.values) > self.max_entries:
+                self.values.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+
+    def forget(self, namespace):
+        """Drop values and the stamp of the namespace."""
+        with self.lock:
+            self.stamps.pop(namespace, None)
+            for key in [key for key, item in self.values.items()
+                        if item[2] == namespace]:
+                del self.values[key]
+            self.stats['l1_flushes'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.stamps.clear()
+            # nothing is left to check until new stamps are learned
+            self.checked = time.monotonic()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+
+class TwoTierCache(BaseCache):
+    """Cache backend with a per-process L1 and a shared L2.
+
+    OPTIONS: L2 is the alias of the shared cache in CACHES, L1_MAX_ENTRIES
+    bounds the local LRU, L1_TIMEOUT limits how long a value lives in it,
+    CHECK_INTERVAL sets how often namespace stamps are read, IMMUTABLE
+    and L2_ONLY list namespaces handled as described above.
+    """
+
+    def __init__(self, name, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.l2_alias = options.pop('L2')
+        self.l1_timeout = options.pop('L1_TIMEOUT', 10)
+        self.check_interval = options.pop('CHECK_INTERVAL', 1)
+        self.immutable = frozenset(options.pop('IMMUTABLE', ()))
+        self.l2_only = frozenset(options.pop('L2_ONLY', ()))
+        max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        super().__init__({**params, 'OPTIONS': options})
+        with _stores_lock:
+            self.store = _stores.setdefault(name, LocalStore(max_entries))
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def get_stats(self):
+        """Return hit and miss counters of both tiers in this process."""
+        with self.store.lock:
+            return dict(self.store.stats)
+
+    def l1_expires(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        now = time.time()
+        limit = time.monotonic() + self.l1_timeout
+        if timeout is None:
+            return limit
+        return min(limit, time.monotonic() + timeout - now)
+
+    def stamped(self, namespace):
+        return not (namespace in self.immutable or namespace in self.l2_only)
+
+    def check_stamps(self):
+        """Drop L1 values of namespaces written by other processes."""
+        now = time.monotonic()
+        if now - self.store.checked < self.check_interval:
+            return
+        self.store.checked = now
+        with self.store.lock:
+            known = dict(self.store.stamps)
+        if not known:
+            return
+        current = self.l2.get_many([stamp_key(name) for name in known])
+        for namespace, stamp in known.items():
+            if current.get(stamp_key(namespace)) != stamp:
+                self.store.forget(namespace)
+
+    def watch(self, namespace):
+        """Learn the stamp of the namespace before reading its values."""
+        if not self.stamped(namespace) or namespace in self.store.stamps:
+            return
+        key = stamp_key(namespace)
+        stamp = self.l2.get(key)
+        if stamp is None:
+            self.l2.add(key, uuid.uuid4().hex, None)
+            stamp = self.l2.get(key)
+        if stamp is not None:
+            with self.store.lock:
+                self.store.stamps.setdefault(namespace, stamp)
+
+    def announce(self, keys):
+        """Replace stamps of namespaces of keys so others drop their L1."""
+        namespaces = {
+            namespace for namespace in map(namespace_of, keys)
+            if self.stamped(namespace)
+        }
+        if not namespaces:
+            return
+        stamps = {name: uuid.uuid4().hex for name in namespaces}
+        self.l2.set_many(
+            {stamp_key(name): stamp for name, stamp in stamps.items()}, None
+        )
+        with self.store.lock:
+            self.store.stamps.update(stamps)
+
+    def remember(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace = namespace_of(key)
+        if namespace in self.l2_only:
+            return
+        if self.stamped(namespace) and namespace not in self.store.stamps:
+            return
+        expires = self.l1_expires(timeout)
+        if expires > time.monotonic():
+            self.store.set(
+                self.make_key(key, version), value, expires, namespace
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # L1 never holds missing keys, so nobody has to forget this one
+        self.watch(namespace_of(key))
+        added = self.l2.add(key, value, timeout, version)
+        if added:
+            self.remember(key, value, timeout, version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        self.check_stamps()
+        namespace = namespace_of(key)
+        if namespace in self.l2_only:
+            return self.l2.get(key, default, version)
+        value = self.store.get(self.make_key(key, version))
+        if value is not MISSING:
+            return value
+        self.watch(namespace)
+        value = self.l2.get(key, MISSING, version)
+        if value is MISSING:
+            self.store.count('l2_misses')
+            return default
+        self.store.count('l2_hits')
+        self.remember(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.check_stamps()
+        found = {}
+        missed = []
+        for key in keys:
+            value = MISSING
+            if namespace_of(key) not in self.l2_only:
+                value = self.store.get(self.make_key(key, version))
+            if value is MISSING:
+                missed.append(key)
+            else:
+                found[key] = value
+        if missed:
+            for namespace in set(map(namespace_of, missed)):
+                self.watch(namespace)
+            shared = self.l2.get_many(missed, version)
+            self.store.count('l2_hits', len(shared))
+            self.store.count('l2_misses', len(missed) - len(shared))
+            for key, value in shared.items():
+                self.remember(key, value, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version)
+        self.announce([key])
+        self.remember(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version)
+        self.announce(data)
+        for key, value in data.items():
+            if key not in failed:
+                self.remember(key, value, timeout, version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version)
+        self.announce([key])
+        self.store.delete(self.make_key(key, version))
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version)
+        self.announce(keys)
+        for key in keys:
+            self.store.delete(self.make_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        """Shift the value in L2 holding a lock on the key.
+
+        incr of DatabaseCache is a get followed by a set, concurrent calls
+        would lose updates without the lock.
+        """
+        lock = f'{INCR_LOCK_PREFIX}{key}'
+        deadline = time.monotonic() + INCR_LOCK_TIMEOUT
+        while not self.l2.add(lock, 1, INCR_LOCK_TIMEOUT, version):
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.005)
+        try:
+            value = self.l2.incr(key, delta, version)
+        finally:
+            self.l2.delete(lock, version)
+        self.announce([key])
+        self.remember(key, value, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        # stamps are gone from L2 too, other processes drop their L1
+        self.l2.clear()
+        self.store.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
@@ -0,0 +1,128 @@
+"""Serving of user uploaded media files.
+
+Files are handed to the front server by X-Accel-Redirect (nginx) or
+X-Sendfile (Apache, lighttpd) when MEDIA_ACCEL is set. Otherwise they are
+streamed by FileResponse, which lets the WSGI server use sendfile, and
+single byte ranges are answered with 206. Uploaded names are never
+reused for other content, so responses are cached as immutable.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+ACCEL = settings.MEDIA_ACCEL
+ACCEL_PREFIX = settings.MEDIA_ACCEL_PREFIX
+MAX_AGE = settings.MEDIA_MAX_AGE
+CHUNK_SIZE = 64 * 1024
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(file_stat):
+    return f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """Return (first, last) byte of a single range or None for all.
+
+    Several ranges and malformed headers are ignored, so the whole file
+    is sent. Raises ValueError when the range lies beyond the file.
+    """
+    match = RANGE.match(header or '')
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if size == 0:
+        raise ValueError('Empty file has no ranges')
+    if not first:
+        if int(last) == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise ValueError('Range starts beyond the file')
+    return first, min(int(last), size - 1) if last else size - 1
+
+
+def read_range(file, first, length):
+    try:
+        file.seek(first)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_response(request, path, full_path, size, etag):
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if ACCEL == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = ACCEL_PREFIX + quote(path)
+        return response
+    if ACCEL == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+    header = request.META.get('HTTP_RANGE')
+    if request.META.get('HTTP_IF_RANGE', etag) != etag:
+        header = None
+    try:
+        byte_range = parse_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            read_range(file, first, last - first + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = last - first + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, path):
+    """Return the media file at path with long-lived cache headers."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Файл не найден')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('Файл не найден')
+    etag = file_etag(file_stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(file_stat.st_mtime)
+    )
+    if response is None:
+        response = file_response(
+            request, path, full_path, file_stat.st_size, etag
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(file_stat.st_mtime)
+    response['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+    return response
@@ -132,9 +132,18 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+# collectstatic добавляет к именам статики хеш содержимого
+STATICFILES_STORAGE = 'yatube.storage.HashedStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# кто отдаёт медиафайлы: None — сам Django, 'x-accel-redirect' — nginx,
+# 'x-sendfile' — Apache или lighttpd
+MEDIA_ACCEL = None
+# internal location nginx, отдающий файлы из MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# имена загруженных файлов не переиспользуются, кешируем их на год
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
 
 # Login
 
@@ -148,15 +157,121 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# в каждом процессе небольшой LRU-кеш перед общим для всех воркеров
+# кешем в базе данных (python manage.py createcachetable)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 10,
+            'CHECK_INTERVAL': 1,
+            # ключи с хешем версий в имени никогда не меняют значение
+            'IMMUTABLE': ['anonymous_page', 'feed_head'],
+            # блокировки живут только в общем кеше
+            'L2_ONLY': ['rebuild_lock', 'thumbnail_job'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
 
 # определяем паджинатор
 PER_PAGE = 10
+# время жизни закешированных счётчиков в карточке автора
+AUTHOR_STATS_TIMEOUT = 60 * 10
+# время жизни закешированного количества записей в ленте
+FEED_COUNT_TIMEOUT = 60 * 60
+# начиная с какого размера общая лента считается приблизительно
+FEED_COUNT_ESTIMATE_FROM = 100000
+# время жизни закешированных страниц лент, устаревают они по сигналам
+FEED_FRAGMENT_TIMEOUT = 60 * 60 * 6
+# сколько секунд отдавать истёкший фрагмент, пока его пересобирают
+FEED_FRAGMENT_GRACE = 60
+# фрагмент пересобирает один запрос, остальные ждут не дольше
+FRAGMENT_REBUILD_LOCK_TIMEOUT = 30
+FRAGMENT_REBUILD_WAIT = 2
+# время жизни страниц, закешированных целиком для анонимных посетителей
+ANONYMOUS_PAGE_TIMEOUT = 60 * 60 * 6
+# время жизни закешированных id пользователей и групп по имени и слагу,
+# при переименовании и удалении они сбрасываются сразу
+CACHED_PK_TIMEOUT = 60 * 60
+# число потоков одного процесса сервера (gunicorn --threads), от него
+# считаются лимиты запросов, которые подолгу держат поток
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))
+
+# сколько новейших записей ленты помнится для ответа "есть новые записи"
+NEW_POSTS_WINDOW = 50
+# долгий опрос держит запрос до появления новых записей, но не дольше
+# этого числа секунд, и проверяет ленту с таким интервалом
+NEW_POSTS_WAIT_TIMEOUT = 25
+NEW_POSTS_POLL_INTERVAL = 1
+# страницы лент опрашивают сервер долгими запросами, только если включено,
+# иначе обычными запросами раз в полминуты
+NEW_POSTS_LONG_POLL = False
+# сколько долгих опросов может ждать в одном процессе, остальным
+# отвечается 503
+NEW_POSTS_MAX_WAITERS = max(SERVER_THREADS // 4, 1)
+
+# живые комментарии: каждое подключение занимает поток сервера, поэтому
+# их число в процессе не больше четверти SERVER_THREADS, а соединение
+# закрывается через LIVE_COMMENTS_MAX_AGE секунд и браузер
+# переподключается сам; страница открывает поток только по кнопке
+LIVE_COMMENTS_MAX_CONNECTIONS = max(SERVER_THREADS // 4, 1)
+LIVE_COMMENTS_MAX_AGE = 60 * 5
+# сколько уведомлений ждёт в очереди одного подписчика
+LIVE_COMMENTS_QUEUE_SIZE = 10
+# как часто сверяться с отметкой последнего комментария в общем кеше,
+# через неё приходят комментарии, добавленные в других процессах
+LIVE_COMMENTS_CHECK_INTERVAL = 2
+# сколько комментариев отправляется за один раз
+LIVE_COMMENTS_BATCH_SIZE = 50
+
+# доставка новых записей в ленты подписчиков
+TIMELINE_FANOUT_BATCH_SIZE = 500
+# у авторов с большим числом подписчиков доставка идёт в фоне
+TIMELINE_FANOUT_SYNC_LIMIT = 1000
+TIMELINE_FANOUT_WORKERS = 2
+
+# выполнять фоновые задачи сразу в том же потоке, нужно для тестов
+BACKGROUND_EAGER = False
+
+# миниатюры картинок строятся в фоне после сохранения записи
+THUMBNAIL_WORKERS = 2
+# сколько секунд не ставить повторно задачу на те же миниатюры
+THUMBNAIL_JOB_TIMEOUT = 60 * 5
+# ширины вариантов картинки записи, лежат рядом с оригиналом
+POST_IMAGE_WIDTHS = [480, 960, 1440]
+# форматы вариантов по предпочтению, последний отдаётся в <img>;
+# форматы, которые не умеет сохранять Pillow, пропускаются
+POST_IMAGE_FORMATS = ['avif', 'webp', 'jpeg']
+POST_IMAGE_QUALITY = 80
+
+# загрузки больше этого размера пишутся во временный файл, а не в память
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+# ограничения загружаемых картинок, размеры проверяются по заголовку
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+# картинка уменьшается до этой длины большей стороны и пересохраняется
+# без EXIF
+POST_IMAGE_MAX_SIDE = 2560
+# сколько картинок разбирается одновременно
+UPLOAD_WORKERS = 2
+# ширина размытого превью, которое встраивается в страницу до загрузки
+# картинки
+POST_IMAGE_PLACEHOLDER_WIDTH = 16
+
+# выгрузка записей и комментариев читает из базы пачками такого размера
+EXPORT_CHUNK_SIZE = 2000
+# и отдаёт данные блоками не меньше этого размера
+EXPORT_BUFFER_SIZE = 64 * 1024
 
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -0,0 +1,18 @@
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+
+class HashedStaticFilesStorage(ManifestStaticFilesStorage):
+    """Static files named by the hash of their content.
+
+    `collectstatic` stores hashed copies, so the front server may cache
+    them forever. Files missing from STATIC_ROOT, e.g. before the first
+    `collectstatic` or in tests, keep their plain names.
+    """
+    manifest_strict = False
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            return FileSystemStorage.url(self, name)